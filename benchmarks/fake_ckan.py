@@ -0,0 +1,219 @@
+import argparse, json, os, random, sys, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from plate_lookup import resources
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures.json")
+
+# Every PERSONAL_EVERY-th plate is only in the personal import resource, every
+# DISABILITY_EVERY-th has a disability tag, and every MISSING_EVERY-th is unknown
+PERSONAL_EVERY = 20
+DISABILITY_EVERY = 10
+MISSING_EVERY = 50
+
+
+# The plates the fake datastore knows about; the benchmark harness draws from the same list
+def plate_numbers(count):
+    return [str(1000000 + i * 7) for i in range(count)]
+
+
+class FakeDatastore:
+    """In-memory stand-in for the five data.gov.il resources.
+
+    Rows are expanded from the fixture records: each plate gets a vehicle
+    row copied from one of the fixture vehicles, so price and details rows
+    are shared per model the way they are upstream.
+    """
+
+    def __init__(self, fixtures=FIXTURES, plates=5000):
+        with open(fixtures, encoding="utf-8") as f:
+            data = json.load(f)
+        self.rows = {name: [] for name in resources.RESOURCES}
+        for i, plate in enumerate(plate_numbers(plates)):
+            if i % MISSING_EVERY == MISSING_EVERY - 1:
+                continue
+            if i % PERSONAL_EVERY == PERSONAL_EVERY - 1:
+                rec = dict(data["personal"][i % len(data["personal"])], mispar_rechev=int(plate))
+                self.rows["personal"].append(rec)
+            else:
+                rec = dict(data["vehicle"][i % len(data["vehicle"])], mispar_rechev=int(plate))
+                self.rows["vehicle"].append(rec)
+            if i % DISABILITY_EVERY == 0:
+                rec = dict(data["disability"][i % len(data["disability"])], **{"MISPAR RECHEV": int(plate)})
+                self.rows["disability"].append(rec)
+        self.rows["price"] = [dict(r) for r in data["price"]]
+        self.rows["details"] = [dict(r) for r in data["details"]]
+        for rows in self.rows.values():
+            for n, row in enumerate(rows, 1):
+                row["_id"] = n
+        self.by_id = {resources.RESOURCES[name]: name for name in resources.RESOURCES}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, resource, column):
+        with self._lock:
+            key = (resource, column)
+            if key not in self._indexes:
+                idx = {}
+                for row in self.rows[resource]:
+                    idx.setdefault(str(row.get(column)), []).append(row)
+                self._indexes[key] = idx
+            return self._indexes[key]
+
+    def search(self, params):
+        resource = self.by_id.get(params.get("resource_id"))
+        if resource is None:
+            return 404, {"success": False, "error": {"message": "Not found: Resource was not found."}}
+        rows = self.rows[resource]
+
+        if params.get("filters"):
+            filters = json.loads(params["filters"])
+            items = list(filters.items())
+            column, values = items[0]
+            values = values if isinstance(values, list) else [values]
+            idx = self.index(resource, column)
+            rows = [row for v in values for row in idx.get(str(v), [])]
+            for column, values in items[1:]:
+                wanted = {str(v) for v in (values if isinstance(values, list) else [values])}
+                rows = [row for row in rows if str(row.get(column)) in wanted]
+        if params.get("q"):
+            q = str(params["q"])
+            column = resources.PLATE_COLUMNS.get(resource)
+            if column:
+                rows = [row for row in rows if q in str(row.get(column))] if params.get("filters") else \
+                    self.index(resource, column).get(q, [])
+            else:
+                rows = [row for row in rows if any(q in str(v) for v in row.values())]
+
+        total = len(rows)
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        rows = rows[offset:offset + limit]
+
+        if params.get("fields"):
+            fields = params["fields"].split(",")
+            known = set().union(*(row.keys() for row in self.rows[resource][:50])) | {"_id"}
+            unknown = [f for f in fields if f not in known]
+            if unknown:
+                return 409, {"success": False, "error": {"fields": [f"field \"{unknown[0]}\" not in table"]}}
+            rows = [{f: row.get(f) for f in fields if f in row} for row in rows]
+        return 200, {"success": True, "result": {"records": rows, "total": total, "resource_id": params["resource_id"]}}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    store = None
+    latency = 0.05
+    jitter = 0.05
+    error_rate = 0.0
+    throttle_rate = 0.0
+    drop_rate = 0.0
+    counts = None
+    lock = threading.Lock()
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        action = url.path.rsplit("/", 1)[-1]
+
+        if action == "_stats":
+            with self.lock:
+                self.send_json(200, dict(self.counts))
+            return
+        if action == "health":
+            self.send_json(200, {"ok": True})
+            return
+
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts[action] += 1
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        roll = random.random()
+        if roll < self.drop_rate:
+            with self.lock:
+                self.counts["dropped"] += 1
+            self.close_connection = True
+            self.connection.close()
+            return
+        roll -= self.drop_rate
+        if roll < self.error_rate:
+            with self.lock:
+                self.counts["errors"] += 1
+            self.send_json(503, {"success": False, "error": {"message": "Service Unavailable"}})
+            return
+        roll -= self.error_rate
+        if roll < self.throttle_rate:
+            with self.lock:
+                self.counts["throttled"] += 1
+            self.send_json(429, {"success": False, "error": {"message": "Too Many Requests"}}, {"Retry-After": "1"})
+            return
+
+        if action == "datastore_search":
+            self.send_json(*self.store.search(params))
+        elif action == "resource_show":
+            self.send_json(200, {"success": True, "result": {"id": params.get("id"), "last_modified": "2024-01-01T00:00:00"}})
+        else:
+            self.send_json(404, {"success": False, "error": {"message": "Not found"}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # Dropped connections are deliberate; don't print their tracebacks
+    def handle_error(self, request, client_address):
+        pass
+
+
+def make_server(store, host="127.0.0.1", port=0, latency=0.05, jitter=0.05, error_rate=0.0, throttle_rate=0.0,
+                drop_rate=0.0):
+    handler = type("BoundFakeHandler", (FakeHandler,), {
+        "store": store, "latency": latency, "jitter": jitter, "error_rate": error_rate,
+        "throttle_rate": throttle_rate, "drop_rate": drop_rate, "counts": Counter(),
+    })
+    return QuietServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.fake_ckan", description="Local fake CKAN datastore_search server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--plates", type=int, default=5000, help="plates in the fake dataset (default: 5000)")
+    parser.add_argument("--latency", type=float, default=0.05, help="base response latency in seconds (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="extra random latency, 0..jitter seconds (default: 0.05)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of connections closed without a response")
+    parser.add_argument("--fixtures", default=FIXTURES, help="fixture records (default: benchmarks/fixtures.json)")
+    args = parser.parse_args(argv)
+
+    store = FakeDatastore(args.fixtures, args.plates)
+    server = make_server(store, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                         args.throttle_rate, args.drop_rate)
+    print(f"Fake CKAN on http://{args.host}:{server.server_address[1]}/api/3/action/datastore_search",
+          file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
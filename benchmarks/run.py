@@ -0,0 +1,260 @@
+import argparse, json, multiprocessing, os, random, socket, subprocess, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.request import urlopen
+
+from plate_lookup.bulk import bulk_lookup
+from plate_lookup.catalog import ModelCatalog
+from plate_lookup.core import LookupEngine, NoDataFound
+from plate_lookup.http_client import CkanClient
+from plate_lookup.metrics import Metrics
+from plate_lookup.scheduler import Scheduler
+
+from .fake_ckan import plate_numbers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Upstream requests per plate a --batch bulk run must stay under: the plate
+# queries of a whole batch share one request, so only model queries remain
+BATCH_REQUESTS_PER_PLATE = 0.25
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Peak resident set size of this process in MB, or None where it can't be read.
+# The peak never goes down, so each mode runs in a process of its own (run_mode).
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def summarize(latencies, elapsed, plates, requests, failed, registry):
+    latencies = sorted(latencies)
+    stages = {name: {"count": st["count"], "mean_ms": round(st["seconds_sum"] / st["count"] * 1000, 2) if st["count"] else 0,
+                     "requests": st["requests"], "cache": st["cache"]}
+              for name, st in registry.to_dict()["stages"].items()}
+    return {
+        "plates": plates,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "throughput": round(plates / elapsed, 2) if elapsed else None,
+        "requests": requests,
+        "requests_per_plate": round(requests / plates, 3) if plates else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+class Harness:
+    def __init__(self, args, port=None):
+        self.args = args
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}/api/3/action/datastore_search"
+        self.server = None
+
+    def start(self):
+        a = self.args
+        cmd = [sys.executable, "-m", "benchmarks.fake_ckan", "--port", str(self.port), "--plates", str(a.dataset),
+               "--latency", str(a.latency), "--jitter", str(a.jitter), "--error-rate", str(a.error_rate),
+               "--throttle-rate", str(a.throttle_rate), "--drop-rate", str(a.drop_rate)]
+        self.server = subprocess.Popen(cmd, cwd=ROOT, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 30
+        while True:
+            try:
+                urlopen(f"http://127.0.0.1:{self.port}/api/3/action/health", timeout=1).read()
+                return
+            except OSError:
+                if time.time() > deadline or self.server.poll() is not None:
+                    raise RuntimeError("fake CKAN server did not start")
+                time.sleep(0.1)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+
+    def requests_made(self):
+        with urlopen(f"http://127.0.0.1:{self.port}/api/3/action/_stats", timeout=5) as r:
+            return json.load(r).get("requests", 0)
+
+    def engine(self, cache_dir, registry):
+        a = self.args
+        client = CkanClient(base_url=self.base_url, pool_size=max(10, a.workers * 3), retries=a.retries,
+                            backoff=0.05, backoff_max=1.0, scheduler=Scheduler(rate=a.rate, burst=a.rate),
+                            hedge_percentile=a.hedge_percentile if a.latency_mode else None)
+        engine = LookupEngine(cache_dir, fanout=a.fanout, stage_workers=max(8, a.workers * 3), client=client,
+                              batching=a.batch, catalog=ModelCatalog(), registry=registry,
+                              speculative=a.latency_mode)
+        return engine, client
+
+    # Sequential lookups, one latency sample each
+    def sequential(self, plates, cache_dir):
+        registry = Metrics()
+        engine, client = self.engine(cache_dir, registry)
+        latencies, failed = [], 0
+        before = self.requests_made()
+        started = time.perf_counter()
+        try:
+            for plate in plates:
+                t = time.perf_counter()
+                try:
+                    engine.lookup(plate)
+                except NoDataFound:
+                    pass
+                except Exception:
+                    failed += 1
+                latencies.append(time.perf_counter() - t)
+        finally:
+            elapsed = time.perf_counter() - started
+            engine.close()
+            client.close()
+        return summarize(latencies, elapsed, len(plates), self.requests_made() - before, failed, registry)
+
+    def bulk(self, plates, cache_dir):
+        registry = Metrics()
+        engine, client = self.engine(cache_dir, registry)
+        latencies, failed = [], 0
+        before = self.requests_made()
+        started = time.perf_counter()
+        try:
+            # Per-plate latency under load comes from each lookup's trace
+            for res in bulk_lookup(plates, workers=self.args.workers, engine=engine, trace=True):
+                if res["trace"]["seconds"] is not None:
+                    latencies.append(res["trace"]["seconds"])
+                if not res["ok"] and not res["error"].startswith("No data found"):
+                    failed += 1
+        finally:
+            elapsed = time.perf_counter() - started
+            engine.close()
+            client.close()
+        return summarize(latencies, elapsed, len(plates), self.requests_made() - before, failed, registry)
+
+    # One mode over ``plates`` with a fresh cache
+    def mode(self, mode, plates):
+        with tempfile.TemporaryDirectory(prefix="plate-bench-") as tmp:
+            cache_dir = os.path.join(tmp, "cache")
+            if mode == "cold":
+                return self.sequential(plates, cache_dir)
+            if mode == "warm":
+                self.sequential(plates, cache_dir)
+                # A fresh engine over the filled cache, as after an app restart
+                return self.sequential(plates, cache_dir)
+            result = self.bulk(plates, cache_dir)
+            if self.args.batch:
+                result["target_requests_per_plate"] = BATCH_REQUESTS_PER_PLATE
+                result["ok"] = result["requests_per_plate"] <= BATCH_REQUESTS_PER_PLATE
+            return result
+
+    def run(self):
+        a = self.args
+        rng = random.Random(a.seed)
+        known = plate_numbers(a.dataset)
+        results = {}
+        for mode in a.modes:
+            plates = rng.sample(known, min(a.bulk_plates, len(known)) if mode == "bulk" else a.lookups)
+            # A fresh interpreter per mode, so peak RSS belongs to that mode alone
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results[mode] = pool.submit(run_mode, a, self.port, mode, plates).result()
+            print(f"{mode}: {format_result(results[mode])}", file=sys.stderr)
+        return results
+
+
+# Entry point of a mode's worker process; talks to the fake server the parent started
+def run_mode(args, port, mode, plates):
+    return Harness(args, port).mode(mode, plates)
+
+
+def format_result(res):
+    line = (f"p50 {res['p50_ms']}ms, p95 {res['p95_ms']}ms, p99 {res['p99_ms']}ms, {res['throughput']} plates/s, "
+            f"{res['requests_per_plate']} requests/plate, peak RSS of mode {res['peak_rss_mb']}MB")
+    if "target_requests_per_plate" in res:
+        line += f" (target {res['target_requests_per_plate']} requests/plate)"
+        if not res["ok"]:
+            line += "  FAIL"
+    return line
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description="Benchmark the lookup pipeline against a local fake CKAN.")
+    parser.add_argument("--modes", default="cold,warm,bulk", help="comma-separated: cold, warm, bulk (default: all)")
+    parser.add_argument("--lookups", type=int, default=200, help="sequential lookups in cold/warm modes (default: 200)")
+    parser.add_argument("--bulk-plates", type=int, default=2000, help="plates in bulk mode (default: 2000)")
+    parser.add_argument("--dataset", type=int, default=5000, help="plates in the fake dataset (default: 5000)")
+    parser.add_argument("-w", "--workers", type=int, default=16, help="bulk mode workers (default: 16)")
+    parser.add_argument("--fanout", action="store_true", help="run each lookup's independent queries concurrently")
+    parser.add_argument("--batch", action="store_true", help="coalesce plate queries into multi-plate requests")
+    parser.add_argument("--latency-mode", action="store_true", help="speculative fallback and hedged requests")
+    parser.add_argument("--hedge-percentile", type=float, default=95.0)
+    parser.add_argument("--rate", type=float, default=10000.0, help="client rate limit in requests/s (default: effectively off)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server base latency in seconds (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="fake server extra random latency (default: 0.05)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of dropped connections")
+    parser.add_argument("--seed", type=int, default=1, help="plate sampling seed (default: 1)")
+    parser.add_argument("-o", "--output", help="result JSON (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in args.modes if m not in ("cold", "warm", "bulk")]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    harness = Harness(args)
+    harness.start()
+    try:
+        results = harness.run()
+    finally:
+        harness.stop()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Saved {output}", file=sys.stderr)
+    return 1 if any(res.get("ok") is False for res in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
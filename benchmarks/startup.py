@@ -0,0 +1,113 @@
+import argparse, json, os, statistics, subprocess, sys, time
+from datetime import datetime
+
+from .run import ROOT, git_commit
+
+# Startup budgets in seconds, on top of a bare interpreter start
+TARGETS = {
+    "core_import": 0.10,
+    "cli_help": 0.15,
+    "gui_window": 1.00,
+}
+
+# Modules a process importing only the lookup core must not have loaded
+HEAVY_MODULES = ("PySide6", "requests", "urllib3", "pyarrow", "numpy")
+
+CORE_PROBE = "import sys, plate_lookup.core, plate_lookup.bulk; print(' '.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+
+# Builds and shows the main window offscreen, then exits
+GUI_PROBE = """
+from PySide6 import QtWidgets
+import main
+app = QtWidgets.QApplication([])
+window = main.MainWindow()
+window.show()
+app.processEvents()
+"""
+
+CASES = {
+    "python": [sys.executable, "-c", "pass"],
+    "core_import": [sys.executable, "-c", CORE_PROBE],
+    "cli_help": [sys.executable, "-m", "plate_lookup", "--help"],
+    "gui_window": [sys.executable, "-c", GUI_PROBE],
+}
+
+
+# Wall time of one fresh process, and its stdout
+def time_process(cmd):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return elapsed, proc.stdout
+
+
+def has_pyside():
+    try:
+        import PySide6  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def measure(runs):
+    results = {}
+    cases = [name for name in CASES if name != "gui_window" or has_pyside()]
+    for name in cases:
+        times, output = [], ""
+        time_process(CASES[name])  # warm the OS file cache and .pyc files
+        for _ in range(runs):
+            elapsed, output = time_process(CASES[name])
+            times.append(elapsed)
+        results[name] = {"median_s": round(statistics.median(times), 4), "min_s": round(min(times), 4)}
+        if name == "core_import":
+            results[name]["heavy_modules"] = output.split()
+    base = results["python"]["median_s"]
+    for name, res in results.items():
+        if name in TARGETS:
+            res["over_python_s"] = round(res["median_s"] - base, 4)
+            res["target_s"] = TARGETS[name]
+            res["ok"] = res["over_python_s"] <= TARGETS[name] and not res.get("heavy_modules")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.startup",
+                                     description="Measure cold start times and check them against their budgets.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per case (default: 5)")
+    parser.add_argument("-o", "--output", help="result JSON (default: benchmarks/results/<time>-<commit>-startup.json)")
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    failed = []
+    for name, res in results.items():
+        line = f"{name}: {res['median_s'] * 1000:.0f}ms"
+        if "target_s" in res:
+            line += f" (+{res['over_python_s'] * 1000:.0f}ms over python, target {res['target_s'] * 1000:.0f}ms)"
+            if res.get("heavy_modules"):
+                line += f", loaded {', '.join(res['heavy_modules'])}"
+            if not res["ok"]:
+                line += "  FAIL"
+                failed.append(name)
+        print(line, file=sys.stderr)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}-startup.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
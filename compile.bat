@@ -17,13 +17,14 @@ echo Installing requirements...
 pip install --upgrade pip
 pip install PySide6 requests pyinstaller
 
-echo Compiling main.py into standalone EXE...
-pyinstaller --onefile --windowed --add-data "assets\app.ico;assets" --icon=assets\app.ico --noconsole --name VehicleLookup main.py
+echo Compiling main.py into a standalone app folder...
+REM --onedir: a --onefile EXE unpacks the whole bundle to a temp folder on every launch
+pyinstaller --onedir --windowed --add-data "assets\app.ico;assets" --icon=assets\app.ico --noconsole --name VehicleLookup main.py
 
 echo Cleaning up build junk...
 rmdir /s /q build
 rmdir /s /q venv
 del /q VehicleLookup.spec
 
-echo Done! Your compiled EXE is in the /dist folder.
+echo Done! Run dist\VehicleLookup\VehicleLookup.exe (ship the whole dist\VehicleLookup folder).
 pause
\ No newline at end of file
@@ -1,9 +1,13 @@
 from PySide6 import QtWidgets, QtCore, QtGui
-import requests, json, os, time
-import html
-import webbrowser
+import heapq, html, os, time
 from pathlib import Path
-from datetime import datetime
+
+from plate_lookup import metrics
+from plate_lookup.bulk import bulk_lookup, read_plates
+from plate_lookup.cancel import CancelToken, Cancelled
+from plate_lookup.core import LookupEngine, signal_args
+from plate_lookup.records import MISSING
+from plate_lookup.scheduler import BATCH, INTERACTIVE
 
 # Helper to escape values for HTML
 def esc_html(x):
@@ -11,183 +15,358 @@ def esc_html(x):
         return ""
     return html.escape(str(x))
 
-class DataFetcher(QtCore.QThread):
-    # Signal to send back the fetched record (dict) and price range (min, max)
-    result = QtCore.Signal(dict, float, float, bool, object, object, bool)
-    error = QtCore.Signal(str)
+# Every signal carries the generation of the search it belongs to, so the
+# window can drop whatever a superseded search still sends
+class SearchSignals(QtCore.QObject):
+    # The fetched record (dict), price range (min, max) and disability/import details
+    result = QtCore.Signal(int, dict, float, float, bool, object, object, bool)
+    error = QtCore.Signal(int, str, str)  # generation, plate, message
+    # Per-stage timings of the lookup (metrics.Trace), sent before result/error
+    traced = QtCore.Signal(int, object)
+    # Sent last for every lookup that started, whatever the outcome
+    done = QtCore.Signal(int)
+
 
-    def __init__(self, plate):
+class LookupTask(QtCore.QRunnable):
+    def __init__(self, signals, engine, plate, generation, token):
         super().__init__()
+        self.signals = signals
+        self.engine = engine
         self.plate = plate
+        self.generation = generation
+        self.token = token
 
     def run(self):
         try:
-            # CKAN API endpoints and resource IDs
-            base_url = "https://data.gov.il/api/3/action/datastore_search"
-            veh_res = "053cea08-09bc-40ec-8f7a-156f0677aff3"
-            price_res = "39f455bf-6db0-4926-859d-017f34eacbcb"
-            details_res = "142afde2-6228-49f9-8a29-9b6c3a0cbe40"
-            disability_res = "c8b9f9c8-4612-4068-934f-d4acd2e3c06e"
-            count_res = "5e87a7a1-2f6f-41c1-8aec-7216d52a6cf6"
-
-            # Ensure cache directory exists
-            cache_dir = "cache"
-            os.makedirs(cache_dir, exist_ok=True)
-
-            # 1) Fetch vehicle data (license query)
-            cache1 = os.path.join(cache_dir, f"veh_{self.plate}.json")
-            # If cache exists and is <7 days old, load it
-            if os.path.exists(cache1) and (time.time() - os.path.getmtime(cache1) < 7*24*3600):
-                with open(cache1, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+            if self.token.cancelled:
+                return
+            trace = metrics.Trace(self.plate)
+            try:
+                result = self.engine.lookup(self.plate, trace, self.token)
+            except Cancelled:
+                return
+            except Exception as e:
+                self.signals.traced.emit(self.generation, trace)
+                self.signals.error.emit(self.generation, self.plate, str(e))
+                return
+            self.signals.traced.emit(self.generation, trace)
+            # Emit the results back to the main thread
+            self.signals.result.emit(self.generation, *signal_args(result))
+        finally:
+            self.signals.done.emit(self.generation)
+
+
+class SearchQueue(QtCore.QObject):
+    """Runs the window's searches on a few long-lived threads.
+
+    Each search() supersedes the previous one: its lookups are cancelled
+    (queued ones never start, running ones abort their requests) and it
+    gets a new generation number. Several plates given to one search()
+    queue up and run back to back on the same threads.
+    """
+
+    def __init__(self, engine, workers=2, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.signals = SearchSignals(self)
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(workers)
+        self.pool.setExpiryTimeout(-1)  # keep idle threads for the next search
+        self.generation = 0
+        self.token = None
+
+    def search(self, plates):
+        self.cancel()
+        self.token = CancelToken()
+        for plate in plates:
+            self.pool.start(LookupTask(self.signals, self.engine, plate, self.generation, self.token))
+        return self.generation
+
+    # Abandon the current search; anything it still sends carries a stale generation
+    def cancel(self):
+        if self.token is not None:
+            self.token.cancel()
+            self.token = None
+        self.pool.clear()  # lookups that haven't started yet
+        self.generation += 1
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.waitForDone()
+
+
+class BulkFetcher(QtCore.QThread):
+    # Finished lookups as (plate, VehicleRecord or None, error or None) rows, sent in batches
+    rows = QtCore.Signal(list)
+    progress = QtCore.Signal(int, int)  # done, failed
+
+    # Rows per batch, and the longest a row waits before being sent
+    BATCH_ROWS = 500
+    BATCH_SECONDS = 0.2
+
+    def __init__(self, plates, engine, workers=16):
+        super().__init__()
+        self.plates = plates
+        self.engine = engine
+        self.workers = workers
+        self.token = CancelToken()
+
+    # Stop reading plates and abort the lookups in flight
+    def cancel(self):
+        self.requestInterruption()
+        self.token.cancel()
+
+    def run(self):
+        batch = []
+        done = failed = 0
+        last_sent = time.monotonic()
+        results = bulk_lookup(self.plates, workers=self.workers, engine=self.engine, compact=True,
+                              token=self.token)
+        try:
+            for res in results:
+                if self.isInterruptionRequested():
+                    break
+                batch.append((res["plate"], res.get("result"), res.get("error")))
+                done += 1
+                if not res["ok"]:
+                    failed += 1
+                if len(batch) >= self.BATCH_ROWS or time.monotonic() - last_sent > self.BATCH_SECONDS:
+                    self.rows.emit(batch)
+                    self.progress.emit(done, failed)
+                    batch = []
+                    last_sent = time.monotonic()
+        finally:
+            results.close()
+            if batch:
+                self.rows.emit(batch)
+            self.progress.emit(done, failed)
+
+
+# Columns of the multi-plate view: header, and the record field (or derived value) shown
+BULK_COLUMNS = [
+    ("מס' רכב", "plate"),
+    ("יצרן", "tozeret_nm"),
+    ("דגם", "degem_nm"),
+    ("שנה", "shnat_yitzur"),
+    ("צבע", "tzeva_rechev"),
+    ("סוג דלק", "sug_delek_nm"),
+    ("מחיר יבואן", "price"),
+    ("תג נכה", "disability_status"),
+    ("יבוא אישי", "personal_import"),
+    ("סטטוס", "status"),
+]
+
+
+def bulk_value(row, key):
+    plate, rec, error = row
+    if key == "plate":
+        return plate
+    if key == "status":
+        return error or "נמצא"  # "found"
+    if rec is None:
+        return None
+    if key == "price":
+        return getattr(rec, "max_price", 0.0) or None
+    value = getattr(rec, key, None)
+    return None if value is MISSING else value
+
+
+class BulkResultsModel(QtCore.QAbstractTableModel):
+    # Rows handed to the view per fetchMore(); the view only asks for more as it scrolls
+    FETCH_ROWS = 1000
+    # Sorted view: new rows are held back and merged in at most every MERGE_MS, or once MERGE_ROWS are waiting
+    MERGE_MS = 250
+    MERGE_ROWS = 5000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._all = []      # every row received, in arrival order
+        self._rows = []     # rows passing the filter: arrival order, or ascending by _keys when sorted
+        self._keys = []     # sort keys of _rows, for merging new rows into place
+        self._empty = []    # sorted view only: matching rows without a value in the sort column
+        self._pending = []  # sorted view only: matching rows not merged in yet
+        self._loaded = 0    # rows exposed to the view so far
+        self._filter = ""
+        self._sort = None   # (column, order)
+        self._merge_timer = QtCore.QTimer(self)
+        self._merge_timer.setSingleShot(True)
+        self._merge_timer.setInterval(self.MERGE_MS)
+        self._merge_timer.timeout.connect(self.merge)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(BULK_COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return BULK_COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        row = self.row(index.row())
+        key = BULK_COLUMNS[index.column()][1]
+        value = bulk_value(row, key)
+        if value is None:
+            return ""
+        if key == "price":
+            return f"₪{int(row[1].min_price)}–₪{int(row[1].max_price)}"
+        if key in ("disability_status", "personal_import"):
+            return "כן" if value else "לא"  # "yes" / "no"
+        return str(value)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self._loaded < self.matching()
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        count = min(self.FETCH_ROWS, self.matching() - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    # Row at a view position; a descending sort reads _rows backwards, rows without a value always come last
+    def row(self, index):
+        if self._sort is None:
+            return self._rows[index]
+        if index >= len(self._rows):
+            return self._empty[index - len(self._rows)]
+        if self._sort[1] == QtCore.Qt.DescendingOrder:
+            return self._rows[len(self._rows) - 1 - index]
+        return self._rows[index]
+
+    def total(self):
+        return len(self._all)
+
+    def matching(self):
+        return len(self._rows) + len(self._empty)
+
+    def matches(self, row):
+        if not self._filter:
+            return True
+        plate, rec, _ = row
+        if self._filter in plate:
+            return True
+        if rec is None:
+            return False
+        return any(self._filter in str(getattr(rec, key, "")).lower() for key in ("tozeret_nm", "degem_nm", "tzeva_rechev"))
+
+    def sort_key(self, row):
+        value = bulk_value(row, BULK_COLUMNS[self._sort[0]][1])
+        if value is None:
+            return None
+        return (0, value) if isinstance(value, (int, float)) else (1, str(value))
+
+    # Rebuild the sorted view from the matching rows
+    def resort(self, rows):
+        keyed, self._empty = [], []
+        for row in rows:
+            key = self.sort_key(row)
+            if key is None:
+                self._empty.append(row)
             else:
-                params = {"resource_id": veh_res, "q": str(self.plate), "limit": 10}
-                response = requests.get(base_url, params=params)
-                data = response.json()
-                with open(cache1, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-
-            records = data.get("result", {}).get("records", [])
-            if not records:
-                # === FALLBACK 1: Personal Import Vehicles ===
-                personal_res = "03adc637-b6fe-402b-9937-7c3d3afc9140"
-                cache_personal = os.path.join(cache_dir, f"personal_{self.plate}.json")
-
-                if os.path.exists(cache_personal) and (time.time() - os.path.getmtime(cache_personal) < 7*24*3600):
-                    with open(cache_personal, 'r', encoding='utf-8') as f:
-                        personal_data = json.load(f)
-                else:
-                    params_personal = {"resource_id": personal_res, "q": str(self.plate), "limit": 1}
-                    response_personal = requests.get(base_url, params=params_personal)
-                    personal_data = response_personal.json()
-                    with open(cache_personal, 'w', encoding='utf-8') as f:
-                        json.dump(personal_data, f, ensure_ascii=False, indent=2)
-
-                personal_records = personal_data.get("result", {}).get("records", [])
-
-                if personal_records:
-                    records = personal_records  # Treat this as vehicle record
-                    # Mark it as personal import type
-                    records[0]["personal_import"] = True
+                keyed.append((key, row))
+        keyed.sort(key=lambda item: item[0])
+        self._keys = [key for key, _ in keyed]
+        self._rows = [row for _, row in keyed]
+
+    # Change the row order between layoutAboutToBeChanged and layoutChanged, moving
+    # the persistent indexes (the view's selection and current row) along with their rows
+    def relayout(self, reorder):
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        held = [self.row(index.row()) for index in old]
+        reorder()
+        if old:
+            where = {id(self.row(i)): i for i in range(self._loaded)}
+            new = [self.index(where[id(row)], index.column()) if id(row) in where else QtCore.QModelIndex()
+                   for row, index in zip(held, old)]
+            self.changePersistentIndexList(old, new)
+        self.layoutChanged.emit()
+
+    # New rows from the fetcher; under a sort they wait in _pending and are
+    # merged in chunks rather than moved into place one by one
+    def append(self, rows):
+        self._all.extend(rows)
+        matching = [row for row in rows if self.matches(row)]
+        if not matching:
+            return
+        if self._sort is not None:
+            self._pending.extend(matching)
+            if len(self._pending) >= self.MERGE_ROWS:
+                self.merge()
+            elif not self._merge_timer.isActive():
+                self._merge_timer.start()
+            return
+        self._rows.extend(matching)
+        if self._loaded < self.FETCH_ROWS:
+            self.fetchMore()
+
+    # Merge the pending rows into the sorted view: sort the chunk, then one linear merge
+    def merge(self):
+        self._merge_timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        def reorder():
+            keyed = []
+            for row in pending:
+                key = self.sort_key(row)
+                if key is None:
+                    self._empty.append(row)
                 else:
-                    records = None
+                    keyed.append((key, row))
+            if keyed:
+                keyed.sort(key=lambda item: item[0])
+                merged = list(heapq.merge(zip(self._keys, self._rows), keyed, key=lambda item: item[0]))
+                self._keys = [key for key, _ in merged]
+                self._rows = [row for _, row in merged]
+
+        self.relayout(reorder)
+        if self._loaded < self.FETCH_ROWS:
+            self.fetchMore()
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        if column < 0:
+            return
 
-            if not records and not personal_records:
-                self.error.emit(f"No data found for plate {self.plate}")
-                return
-                
-            record = records[0]  # use the first matching record
-
-            # 2) Fetch importer price data (using degem_cd and tozeret_cd)
-            degem_cd = record.get("degem_cd", 0)
-            tozeret_cd = record.get("tozeret_cd", 0)
-            shnat_yitzur = record.get("shnat_yitzur", None)
-            cache2 = os.path.join(cache_dir, f"price_{degem_cd}_{tozeret_cd}.json")
-            if os.path.exists(cache2) and (time.time() - os.path.getmtime(cache2) < 7*24*3600):
-                with open(cache2, 'r', encoding='utf-8') as f:
-                    price_data = json.load(f)
-            else:
-                filters = {"degem_cd": [degem_cd], "tozeret_cd": [tozeret_cd]}
-                params = {"resource_id": price_res, "filters": json.dumps(filters), "limit": 100}
-                response2 = requests.get(base_url, params=params)
-                price_data = response2.json()
-                with open(cache2, 'w', encoding='utf-8') as f:
-                    json.dump(price_data, f, ensure_ascii=False, indent=2)
-
-            cache2_1 = os.path.join(cache_dir, f"details_{degem_cd}_{tozeret_cd}.json")
-            if os.path.exists(cache2_1) and (time.time() - os.path.getmtime(cache2_1) < 7*24*3600):
-                with open(cache2_1, 'r', encoding='utf-8') as f:
-                    details_data = json.load(f)
-            else:
-                filters = {"degem_cd": [degem_cd], "tozeret_cd": [tozeret_cd], "shnat_yitzur": [shnat_yitzur]}
-                params = {"resource_id": details_res, "filters": json.dumps(filters), "limit": 100}
-                response2_1 = requests.get(base_url, params=params)
-                details_data = response2_1.json()
-                with open(cache2_1, 'w', encoding='utf-8') as f:
-                    json.dump(details_data, f, ensure_ascii=False, indent=2)
-
-            cache3 = os.path.join(cache_dir, f"disability_{self.plate}.json")
-            if os.path.exists(cache3) and (time.time() - os.path.getmtime(cache3) < 7*24*3600):
-                with open(cache3, 'r', encoding='utf-8') as f:
-                    disability_data = json.load(f)
-            else:
-                params = {"resource_id": disability_res, "q": str(self.plate), "limit": 5}
-                response3 = requests.get(base_url, params=params)
-                disability_data = response3.json()
-                with open(cache3, 'w', encoding='utf-8') as f:
-                    json.dump(disability_data, f, ensure_ascii=False, indent=2)
-
-            # Parse disability response
-            disability_records = disability_data.get("result", {}).get("records", [])
-            if disability_records:
-                dis_tag = disability_records[0]   # use first record
-                disability_status = True
-                disability_type = dis_tag.get("SUG TAV", "")
-                disability_issue_date = dis_tag.get("TAARICH HAFAKAT TAG", "")
-            else:
-                disability_status = False
-                disability_type = None
-                disability_issue_date = None
-
-            price_records = price_data.get("result", {}).get("records", [])
-            prices = []
-            for rec in price_records:
-                if record.get("yevuan_rehev") is None:
-                    record["yevuan_rehev"] = rec.get("shem_yevuan")
-
-                val = rec.get("mehir")
-                if val is not None:
-                    try:
-                        prices.append(float(val))
-                    except:
-                        # Try stripping commas if any, e.g. "120,000"
-                        try:
-                            prices.append(float(val.replace(',', '').strip()))
-                        except:
-                            pass
-
-            if prices:
-                min_price = min(prices)
-                max_price = max(prices)
-            else:
-                min_price = max_price = 0.0
-
-            details_records = details_data.get("result", {}).get("records", [])
-            if details_records:
-                record_data = details_records[0]  # pick the first record
-                record["automatic_ind"] = record_data.get("automatic_ind", "לא רשום")
-                record["merkav"] = record_data.get("merkav", "לא רשום")
-                record["nefah_manoa"] = record_data.get("nefah_manoa", "לא רשום")
-                record["kvuzat_agra_cd"] = record_data.get("kvuzat_agra_cd", "לא רשום")
-                record["abs_ind"] = record_data.get("abs_ind", "לא רשום")
-                record["kariot_avir_source"] = record_data.get("kariot_avir_source", "לא רשום")
-                record["hege_koah_ind"] = record_data.get("hege_koah_ind", "לא רשום")
-                record["halonot_hashmal_source"] = record_data.get("halonot_hashmal_source", "לא רשום")
-                record["halon_bagg_ind"] = record_data.get("halon_bagg_ind", "לא רשום")
-                record["mispar_dlatot"] = record_data.get("mispar_dlatot", "לא רשום")
-                record["koah_sus"] = record_data.get("koah_sus", "לא רשום")
-                record["mispar_moshavim"] = record_data.get("mispar_moshavim", "לא רשום")
-                record["bakarat_yatzivut_ind"] = record_data.get("bakarat_yatzivut_ind", "לא רשום")
-                record["kosher_grira_im_blamim"] = record_data.get("kosher_grira_im_blamim", "לא רשום")
-                record["kosher_grira_bli_blamim"] = record_data.get("kosher_grira_bli_blamim", "לא רשום")
-                record["kvutzat_zihum"] = record_data.get("kvutzat_zihum", "לא רשום")
-                record["bakarat_stiya_menativ_ind"] = record_data.get("bakarat_stiya_menativ_ind", "לא רשום")
-                record["nitur_merhak_milfanim_ind"] = record_data.get("nitur_merhak_milfanim_ind", "לא רשום")
-                record["zihuy_beshetah_nistar_ind"] = record_data.get("zihuy_beshetah_nistar_ind", "לא רשום")
-            
-            # Emit the results back to the main thread
-            self.result.emit(
-                record,
-                min_price,
-                max_price,
-                disability_status,
-                disability_type,
-                disability_issue_date,
-                record.get("personal_import", False)
-            )
+        def reorder():
+            rows = [self.row(i) for i in range(self.matching())] + self._pending if self._sort is not None else self._rows
+            self._pending = []
+            self._sort = (column, order)
+            self.resort(rows)
+
+        self._merge_timer.stop()
+        self.relayout(reorder)
+        if self._loaded < self.FETCH_ROWS:
+            self.fetchMore()
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self._merge_timer.stop()
+        self._pending = []
+        self._filter = text.strip().lower()
+        rows = [row for row in self._all if self.matches(row)]
+        if self._sort is not None:
+            self.resort(rows)
+        else:
+            self._rows = rows
+        self._loaded = min(self.FETCH_ROWS, self.matching())
+        self.endResetModel()
 
-        except Exception as e:
-            self.error.emit(str(e))
+    def clear(self):
+        self.beginResetModel()
+        self._merge_timer.stop()
+        self._all, self._rows, self._keys, self._empty, self._pending, self._loaded = [], [], [], [], [], 0
+        self.endResetModel()
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -197,10 +376,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Input for license plate
         self.input = QtWidgets.QLineEdit()
-        self.input.setPlaceholderText("Enter license plate")
-        # Search button
+        self.input.setPlaceholderText("Enter license plate (several: separate with commas)")
+        self.input.returnPressed.connect(self.search_plate)
+        # Search button; a new search replaces the one still running
         self.search_btn = QtWidgets.QPushButton("Search")
         self.search_btn.clicked.connect(self.search_plate)
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_search)
+        self.cancel_btn.setEnabled(False)
         # Export to HTML button (disabled until we have data)
         self.export_btn = QtWidgets.QPushButton("Export to HTML")
         self.export_btn.clicked.connect(self.export_html)
@@ -220,6 +403,7 @@ class MainWindow(QtWidgets.QMainWindow):
         top_layout = QtWidgets.QHBoxLayout()
         top_layout.addWidget(self.input)
         top_layout.addWidget(self.search_btn)
+        top_layout.addWidget(self.cancel_btn)
 
         central_layout = QtWidgets.QVBoxLayout()
         central_layout.addLayout(top_layout)
@@ -229,29 +413,183 @@ class MainWindow(QtWidgets.QMainWindow):
 
         central_widget = QtWidgets.QWidget()
         central_widget.setLayout(central_layout)
-        self.setCentralWidget(central_widget)
+
+        # Multi-plate tab: plates from a file, looked up in the background into a lazy table
+        self.bulk_open_btn = QtWidgets.QPushButton("Open plates file...")
+        self.bulk_open_btn.clicked.connect(self.open_bulk_file)
+        self.bulk_cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.bulk_cancel_btn.clicked.connect(self.cancel_bulk)
+        self.bulk_cancel_btn.setEnabled(False)
+        self.bulk_filter = QtWidgets.QLineEdit()
+        self.bulk_filter.setPlaceholderText("סינון: מספר רכב, יצרן, דגם, צבע")  # "Filter: plate, make, model, colour"
+        self.bulk_filter.textChanged.connect(self.filter_bulk)
+        self.bulk_status = QtWidgets.QLabel("")
+
+        self.bulk_model = BulkResultsModel(self)
+        self.bulk_view = QtWidgets.QTableView()
+        self.bulk_view.setModel(self.bulk_model)
+        self.bulk_view.setSortingEnabled(True)
+        self.bulk_view.verticalHeader().setVisible(False)
+        # Fixed row height so the view never measures rows it doesn't show
+        self.bulk_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.bulk_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.bulk_view.doubleClicked.connect(self.show_bulk_row)
+
+        bulk_top = QtWidgets.QHBoxLayout()
+        bulk_top.addWidget(self.bulk_open_btn)
+        bulk_top.addWidget(self.bulk_cancel_btn)
+        bulk_top.addWidget(self.bulk_filter)
+        bulk_layout = QtWidgets.QVBoxLayout()
+        bulk_layout.addLayout(bulk_top)
+        bulk_layout.addWidget(self.bulk_view)
+        bulk_layout.addWidget(self.bulk_status)
+        bulk_widget = QtWidgets.QWidget()
+        bulk_widget.setLayout(bulk_layout)
+
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.addTab(central_widget, "חיפוש")  # "Search"
+        self.tabs.addTab(bulk_widget, "חיפוש מרובה")  # "Bulk search"
+        self.setCentralWidget(self.tabs)
+        self.bulk_worker = None
+        self._bulk_engine = None
 
         # Hold the current record and prices
         self.current_record = None
         self.current_min_price = 0.0
         self.current_max_price = 0.0
+        self.current_trace = None
+
+        # Shared lookup engine; runs the independent CKAN queries of a search in parallel.
+        # With PLATE_LOOKUP_SERVER set, searches go to a shared lookup service instead.
+        # Neither loads requests until the first search, which runs off the UI thread.
+        server_url = os.environ.get("PLATE_LOOKUP_SERVER")
+        if server_url:
+            from plate_lookup.server import RemoteLookup
+            self.engine = RemoteLookup(server_url)
+        else:
+            self.engine = LookupEngine(fanout=True, priority=INTERACTIVE)
+
+        # Searches run on a small reusable pool; results of superseded searches are dropped
+        self.searches = SearchQueue(self.engine, parent=self)
+        self.searches.signals.traced.connect(self.on_trace)
+        self.searches.signals.result.connect(self.on_result)
+        self.searches.signals.error.connect(self.on_error)
+        self.searches.signals.done.connect(self.on_done)
+        self.search_pending = 0
+        self.search_total = 0
+
+    # Engine for multi-plate lookups: same cache and connections, but queued behind single searches
+    def bulk_engine(self):
+        if not isinstance(self.engine, LookupEngine):
+            return self.engine
+        if self._bulk_engine is None:
+            self._bulk_engine = LookupEngine(fanout=True, client=self.engine.client, cache=self.engine.cache,
+                                             catalog=self.engine.catalog, priority=BATCH)
+        return self._bulk_engine
+
+    def open_bulk_file(self):
+        filename, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open plates", "", "Plate lists (*.csv *.txt *.jsonl);;All Files (*)")
+        if filename:
+            self.start_bulk(read_plates(filename))
+
+    def start_bulk(self, plates):
+        self.cancel_bulk()
+        self.bulk_model.clear()
+        self.bulk_status.setText("מחפש...")  # "Searching..."
+        self.bulk_worker = BulkFetcher(plates, self.bulk_engine())
+        self.bulk_worker.rows.connect(self.bulk_model.append)
+        self.bulk_worker.progress.connect(self.bulk_progress)
+        self.bulk_worker.finished.connect(lambda: self.bulk_cancel_btn.setEnabled(False))
+        self.bulk_cancel_btn.setEnabled(True)
+        self.bulk_worker.start()
+
+    def cancel_bulk(self):
+        if self.bulk_worker is not None and self.bulk_worker.isRunning():
+            self.bulk_worker.cancel()
+
+    def bulk_progress(self, done, failed):
+        # "N plates, M errors, K shown"
+        self.bulk_status.setText(f"{done} רכבים, {failed} שגיאות, {self.bulk_model.matching()} מוצגים")
+
+    def closeEvent(self, event):
+        self.searches.shutdown()
+        self.cancel_bulk()
+        if self.bulk_worker is not None:
+            self.bulk_worker.wait()
+        super().closeEvent(event)
+
+    def filter_bulk(self, text):
+        self.bulk_model.set_filter(text)
+
+    # Double-click shows the plate in the single-search tab, ready for HTML export
+    def show_bulk_row(self, index):
+        plate, rec, error = self.bulk_model.row(index.row())
+        if rec is None:
+            return
+        self.cancel_search()
+        self.current_trace = None
+        self.table.setRowCount(0)
+        self.handle_results(*signal_args(rec.to_result()))
+        self.tabs.setCurrentIndex(0)
 
     def search_plate(self):
-        plate = self.input.text().strip()
-        if not plate:
+        plates = [p.strip() for p in self.input.text().replace(";", ",").split(",") if p.strip()]
+        if not plates:
             QtWidgets.QMessageBox.warning(self, "Error", "Please enter a license plate.")
             return
-        self.search_btn.setEnabled(False)
+        self.table.setRowCount(0)
         self.price_label.setText("מחפש...")  # "Searching..."
-        # Start the data fetcher thread
-        self.worker = DataFetcher(plate)
-        self.worker.result.connect(self.handle_results)
-        self.worker.error.connect(self.handle_error)
-        self.worker.start()
+        self.search_pending = self.search_total = len(plates)
+        self.cancel_btn.setEnabled(True)
+        self.searches.search(plates)
+
+    def cancel_search(self):
+        self.searches.cancel()
+        if self.search_pending:
+            self.search_pending = 0
+            self.cancel_btn.setEnabled(False)
+            self.price_label.setText("החיפוש בוטל")  # "Search cancelled"
+
+    # Search pool signals; anything from a superseded search is ignored
+    def on_trace(self, generation, trace):
+        if self.searches.is_current(generation):
+            self.handle_trace(trace)
+
+    def on_result(self, generation, *result):
+        if self.searches.is_current(generation):
+            self.handle_results(*result)
+
+    def on_error(self, generation, plate, msg):
+        if self.searches.is_current(generation):
+            self.handle_error(msg, plate)
+
+    def on_done(self, generation):
+        if self.searches.is_current(generation) and self.search_pending:
+            self.search_pending -= 1
+            if not self.search_pending:
+                self.cancel_btn.setEnabled(False)
+
+    def handle_trace(self, trace):
+        self.current_trace = trace
+        self.show_timing()
+
+    # Add a GUI-side stage (table render, HTML export) to the current trace and the process metrics
+    def record_stage(self, name, seconds):
+        metrics.REGISTRY.observe(name, seconds)
+        if self.current_trace is not None:
+            self.current_trace.add(name, seconds=seconds)
+        self.show_timing()
+
+    # Compact timing readout in the status bar, e.g. "612ms | vehicle 340ms (miss) · price 120ms (hit) · ..."
+    def show_timing(self):
+        trace = self.current_trace
+        if trace is None:
+            return
+        total = f"{trace.seconds * 1000:.0f}ms | " if trace.seconds is not None else ""
+        self.statusBar().showMessage(total + trace.summary())
 
     def handle_results(self, record, min_price, max_price, disability_status, disability_type, disability_issue_date, personal_import):
-        # Re-enable search button
-        self.search_btn.setEnabled(True)
+        render_started = time.perf_counter()
         self.current_record = record
         self.current_min_price = min_price
         self.current_max_price = max_price
@@ -262,14 +600,15 @@ class MainWindow(QtWidgets.QMainWindow):
 
         vehicle_id_number = record.get("misgeret", "") or record.get("shilda", "")
 
-        # Populate the table (one row with fields from record)
-        self.table.setRowCount(1)
-        self.table.setItem(0, 0, QtWidgets.QTableWidgetItem(str(record.get("mispar_rechev", ""))))
-        self.table.setItem(0, 1, QtWidgets.QTableWidgetItem(record.get("tozeret_nm", "")))
-        self.table.setItem(0, 2, QtWidgets.QTableWidgetItem(record.get("degem_nm", "")))
-        self.table.setItem(0, 3, QtWidgets.QTableWidgetItem(str(record.get("shnat_yitzur", ""))))
-        self.table.setItem(0, 4, QtWidgets.QTableWidgetItem(record.get("tzeva_rechev", "לא רשום")))
-        self.table.setItem(0, 5, QtWidgets.QTableWidgetItem(vehicle_id_number))
+        # Populate the table (one row per plate of the search, with fields from record)
+        row = self.table.rowCount()
+        self.table.setRowCount(row + 1)
+        self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(str(record.get("mispar_rechev", ""))))
+        self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(record.get("tozeret_nm", "")))
+        self.table.setItem(row, 2, QtWidgets.QTableWidgetItem(record.get("degem_nm", "")))
+        self.table.setItem(row, 3, QtWidgets.QTableWidgetItem(str(record.get("shnat_yitzur", ""))))
+        self.table.setItem(row, 4, QtWidgets.QTableWidgetItem(record.get("tzeva_rechev", "לא רשום")))
+        self.table.setItem(row, 5, QtWidgets.QTableWidgetItem(vehicle_id_number))
         self.table.resizeColumnsToContents()
 
         # Display the price range
@@ -287,9 +626,16 @@ class MainWindow(QtWidgets.QMainWindow):
             self.price_label.setText(self.price_label.text() + " | יבוא אישי")
 
         self.export_btn.setEnabled(True)
-
-    def handle_error(self, msg):
-        self.search_btn.setEnabled(True)
+        self.record_stage("render", time.perf_counter() - render_started)
+
+    def handle_error(self, msg, plate=None):
+        if self.search_total > 1:
+            # Several plates queued: note the failure in the table instead of stopping at a dialog
+            row = self.table.rowCount()
+            self.table.setRowCount(row + 1)
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(plate or ""))
+            self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(msg))
+            return
         QtWidgets.QMessageBox.warning(self, "Error", msg)
         self.price_label.setText("שגיאה בחיפוש")  # "Search error"
 
@@ -304,279 +650,26 @@ class MainWindow(QtWidgets.QMainWindow):
             self.generate_html(filename)
 
     def generate_html(self, filepath):
-        record = self.current_record or {}
-        min_price = self.current_min_price or 0
-        max_price = self.current_max_price or 0
+        # Loaded on first export; startup doesn't need them
+        import webbrowser
+        from plate_lookup.report import render_report
+
+        render_started = time.perf_counter()
+        result = {
+            "record": self.current_record or {},
+            "min_price": self.current_min_price or 0,
+            "max_price": self.current_max_price or 0,
+            "disability_status": self.disability_status,
+            "disability_type": self.disability_type,
+            "disability_issue_date": self.disability_issue_date,
+            "personal_import": getattr(self, 'personal_import', False),
+        }
 
         out_path = Path(filepath)
         out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Identify vehicle ID number
-        vehicle_id_number = record.get("misgeret", "") or record.get("shilda", "")
-
-        # A cleaner label mapping for better display
-        label_map = {
-            "mispar_rechev": "מספר רכב",
-            "tozeret_nm": "יצרן",
-            "degem_nm": "דגם",
-            "degem_manoa": "דגם מנוע",
-            "shnat_yitzur": "שנת יצור",
-            "tzeva_rechev": "צבע",
-            "sug_delek_nm": "סוג דלק",
-            "merkav": "מבנה רכב",
-            "nefach_manoa": "נפח מנוע",
-            "koah_sus": "כוח סוס",
-            "mispar_dlatot": "מספר דלתות",
-            "mispar_moshavim": "מספר מושבים",
-            "baalut": "בעלות",
-            "tokef_dt": "תוקף רישום",
-            "mivchan_acharon_dt": "מבחן אחרון",
-            "kvuzat_agra_cd": "קבוצת רישוי",
-            "automatic_ind": "תיבת הילוכים אוטומטית",
-            "abs_ind": "מערכת בלימה ABS",
-            "hege_koah_ind": "הגה כוח",
-            "kariot_avir_source": "כמות כריות אוויר",
-            "bakarat_stiya_menativ_ind": "בקרת סטייה מנתיב",
-            "bakarat_yatzivut_ind": "בקרת יציבות",
-            "halon_bagg_ind": "חלון בגג",
-            "nitur_merhak_milfanim_ind": "ניטור מרחק מלפנים",
-            "zihuy_beshetah_nistar_ind": "זיהוי בשטח נסתר",
-        }
-
-        display_pairs = []
-
-        # Top-priority fields for General Info
-        display_pairs.append(("מס' שלדה/מנוע", esc_html(vehicle_id_number)))
-        for key in ["mispar_rechev", "tozeret_nm", "degem_manoa", "degem_nm", "shnat_yitzur", "tzeva_rechev", "sug_delek_nm"]:
-            if record.get(key):
-                display_pairs.append((label_map.get(key, key), esc_html(record.get(key))))
-
-        # Disability status
-        if self.disability_status:
-            display_pairs.append(("תג נכה", "<i class='bi bi-check-circle-fill' style='color:green'></i>"))
-            display_pairs.append(("סוג תג", esc_html(self.disability_type)))
-            display_pairs.append(("תאריך הפקה", esc_html(self.disability_issue_date)))
-        else:
-            display_pairs.append(("תג נכה", "<i class='bi bi-x-circle-fill' style='color:red'></i>"))
-
-        # Personal import
-        display_pairs.append(("ייבוא אישי", "<i class='bi bi-check-circle-fill' style='color:green'></i>" if getattr(self, 'personal_import', False) else "<i class='bi bi-x-circle-fill' style='color:red'></i>"))
-
-        # Other structured fields
-        for key in ["merkav", "nefach_manoa", "koah_sus", "mispar_dlatot", "mispar_moshavim", "baalut",
-                    "tokef_dt", "mivchan_acharon_dt", "kvuzat_agra_cd", "kariot_avir_source"]:
-            if record.get(key):
-                display_pairs.append((label_map.get(key, key), esc_html(record.get(key))))
-
-        # Icon rendering for *_ind fields (binary Yes/No)
-        for k, v in record.items():
-            if k.endswith("_ind"):
-                label = label_map.get(k, k.replace("_ind", "").strip())
-                icon = "<i class='bi bi-check-circle-fill' style='color:green'></i>" if str(v) == "1" else "<i class='bi bi-x-circle-fill' style='color:red'></i>"
-                display_pairs.append((label, icon))
-
-        # Append *_nm fields not already included
-        for k, v in record.items():
-            if k.endswith("_nm") and v and label_map.get(k) is None:
-                display_pairs.append((esc_html(k.replace("_nm", "")), esc_html(v)))
-
-        # Price handling (unchanged logic)
-        if min_price == max_price == 0:
-            price_text = "מחיר יבואן: לא זמין"
-            price_low = price_high = None
-        else:
-            try:
-                low = float(min_price)
-                high = float(max_price)
-            except Exception:
-                low = high = 0
-            price_text = f"מחיר יבואן משוער: ₪{int(low):,} – ₪{int(high):,}" if low != high else f"מחיר יבואן משוער: ₪{int(low):,}"
-            price_low, price_high = low, high
-
-        # CSS / HTML template (unchanged except for sections)
-        css = """
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css">
-        <style>
-        @media print {
-            .page { page-break-after: always; }
-        }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial;
-            margin: 20px;
-            direction: rtl;
-            background: #f5f6fa;
-            color: #111;
-        }
-        .container {
-            max-width: 900px;
-            margin: auto;
-            padding: 20px;
-        }
-        header {
-            text-align: center;
-            margin-bottom: 20px;
-        }
-        header h1 {
-            font-size: 24px;
-            letter-spacing: 0.5px;
-            background: linear-gradient(90deg,#2bb7ff,#0066cc);
-            -webkit-background-clip: text;
-            color: transparent;
-        }
-        header .meta {
-            font-size: 13px;
-            color: #666;
-            margin-top: 4px;
-        }
-
-        .section {
-            background: #fff;
-            border-radius: 10px;
-            padding: 18px;
-            margin-bottom: 18px;
-            box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-        }
-
-        .section h2 {
-            font-size: 16px;
-            margin-bottom: 12px;
-            color: #0066cc;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }
-        .section h2 i { font-size: 18px; }
-
-        .grid {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 12px 20px;
-        }
-        .grid-item {
-            display: flex;
-            justify-content: space-between;
-            padding: 8px 0;
-            border-bottom: 1px dashed #eaecef;
-        }
-        .grid-item:last-child { border-bottom: none; }
-        .label {
-            font-weight: 600;
-            color: #333;
-        }
-        .value {
-            direction: ltr;
-            text-align: left;
-            color: #111;
-        }
-        .price-block {
-            margin-top: 16px;
-            display: flex;
-            gap: 12px;
-            align-items: center;
-        }
-        .price-text { font-weight: 700; color: #0b5ed7; }
-        .price-bar {
-            flex: 1;
-            height: 18px;
-            background: #eee;
-            border-radius: 10px;
-            overflow: hidden;
-            position: relative;
-        }
-        .price-fill {
-            height: 100%;
-            background: linear-gradient(90deg,#2bb7ff,#0066cc);
-            width: 0%;
-            transition: width 400ms ease;
-        }
-        .footer {
-            margin-top: 24px;
-            font-size: 12px;
-            color: #777;
-            text-align: center;
-        }
-        a { color: #0b5ed7; }
-        </style>
-        """
-
-        # Price bar fill percentage logic: if we have min and max show relative fill for min/max
-        price_bar_html = ""
-        if price_low is not None and price_high is not None and price_high > 0:
-            # percentage of min relative to max (0-100)
-            pct = int((price_low / price_high) * 100) if price_high > 0 else 0
-            # two markers: low and high printed next to bar
-            price_bar_html = f"""
-            <div class="price-block">
-                <div class="price-text">{esc_html(price_text)}</div>
-                <div class="price-text">יובא על ידי: {esc_html(record["yevuan_rehev"])}</div>
-                <div class="price-bar" aria-hidden="true">
-                <div class="price-fill" style="width:{pct}%"></div>
-                </div>
-                <div style="min-width:120px;text-align:left;font-size:13px;color:#333;">
-                <div>נמוך: ₪{int(price_low):,}</div>
-                <div>גבוה: ₪{int(price_high):,}</div>
-                </div>
-            </div>
-            """
-        else:
-            price_bar_html = f"<div class='price-block'><div class='price-text'>{esc_html(price_text)}</div></div>"
-
-        rows_html = [
-            f"<div class='grid-item'><span class='label'>{label}</span><span class='value'>{value}</span></div>"
-            for label, value in display_pairs
-        ]
-
-        # Better grouping — dynamic slicing
-        sections_html = f"""
-        <div class='section'>
-            <h2><i class='bi bi-info-circle'></i> פרטים כלליים</h2>
-            <div class='grid'>{''.join(rows_html[:10])}</div>
-        </div>
-        <div class='section'>
-            <h2><i class='bi bi-card-list'></i> רישוי ובעלות</h2>
-            <div class='grid'>{''.join(rows_html[10:15])}</div>
-        </div>
-        <div class='section'>
-            <h2><i class='bi bi-gear'></i> מפרט טכני</h2>
-            <div class='grid'>{''.join(rows_html[15:22])}</div>
-        </div>
-        <div class='section'>
-            <h2><i class='bi bi-shield-check'></i> מערכות בטיחות ופיצ'רים</h2>
-            <div class='grid'>{''.join(rows_html[22:])}</div>
-        </div>
-        """
-
-        now_s = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        html_doc = f"""<!doctype html>
-        <html lang="he">
-        <head>
-            <meta charset="utf-8">
-            <title>דו"ח רכב - {esc_html(record.get('mispar_rechev',''))}</title>
-            {css}
-        </head>
-        <body>
-        <div class="container page">
-            <header>
-                <h1>דו"ח איתור וניתוח רכב</h1>
-                <div class="meta">נוצר: {now_s} — מקור: data.gov.il</div>
-            </header>
-
-            <div class="intro">
-                מסמך זה מציג את תוצאות החיפוש, המיון והעיבוד עבור מספר רכב מבוקש. המידע נלקח ממאגרי מידע ציבוריים ומשקף את מצב הרכב כפי שנרשם.
-            </div>
-
-            {sections_html}
-
-            {price_bar_html}
-
-            <div class="footer">דוח זה נוצר אוטומטית. מידע זה אינו מהווה תחליף לבדיקה מקצועית.</div>
-        </div>
-        </body>
-        </html>
-        """
-
-        out_path.write_text(html_doc, encoding="utf-8")
+        # Precompiled template with the stylesheet inlined (plate_lookup.report renders batches too)
+        out_path.write_text(render_report(result), encoding="utf-8")
+        self.record_stage("html", time.perf_counter() - render_started)
 
         try:
             webbrowser.open(out_path.resolve().as_uri())
@@ -585,8 +678,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         return str(out_path)
 
-def show_welcome_message():
-    msg = QtWidgets.QMessageBox()
+def show_welcome_message(parent=None):
+    msg = QtWidgets.QMessageBox(parent)
     msg.setWindowTitle("Vehicle License Plate Indexing | קבלת פנים")
     msg.setIcon(QtWidgets.QMessageBox.Information)
 
@@ -610,9 +703,10 @@ if __name__ == "__main__":
     # Set icon for the running application
     app.setWindowIcon(QtGui.QIcon("assets/app.ico"))
 
-    show_welcome_message()
-
     window = MainWindow()
     window.resize(600, 400)
     window.show()
+
+    # Greet once the main window is up rather than before building it
+    QtCore.QTimer.singleShot(0, lambda: show_welcome_message(window))
     app.exec()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import importlib
+
+# Public names and the submodule defining each. Submodules are imported on
+# first access, so e.g. ``python -m plate_lookup.report`` or a script that
+# only needs VehicleRecord doesn't load the lookup pipeline.
+_EXPORTS = {
+    "LookupEngine": "core", "NoDataFound": "core", "lookup_plate": "core",
+    "bulk_lookup": "bulk", "read_plates": "bulk",
+    "CancelToken": "cancel", "Cancelled": "cancel",
+    "CkanClient": "http_client",
+    "InvalidPlate": "planner", "normalize_plate": "planner",
+    "MISSING": "records", "VehicleRecord": "records", "filter_records": "records", "sort_records": "records",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,362 @@
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from . import metrics, resources
+from .cache import CachePolicy, open_cache
+from .catalog import ModelCatalog
+from .core import (PLATE_LIMITS, NoDataFound, build_model, build_result, cache_state, details_query, get_records,
+                   model_key, model_of, model_ttl, personal_record, plate_entry, plate_records, price_query,
+                   rejected, rejects_projection, slim)
+from .http_client import RETRY_STATUSES, get_client, retry_delay
+from .planner import normalize_plate, plan_plate_query
+from .scheduler import BATCH
+
+
+class AsyncLookupEngine:
+    """asyncio version of LookupEngine for embedding in async services.
+
+    HTTP goes through one aiohttp session with a bounded keep-alive
+    connection pool (``max_connections``); ``concurrency`` caps the lookups
+    in flight. Inside a lookup the disability query runs alongside the
+    vehicle query, and price/details run together once the model is known.
+    Results have the same shape as LookupEngine.lookup().
+
+    Every request, retries included, first takes a slot from ``scheduler``
+    (by default the one the process-wide CkanClient uses), so async and
+    threaded lookups share one rate limit and adaptive concurrency limit,
+    and queue by ``priority``.
+
+    Queries, cache policies, field projection, the model catalog, the
+    ``mirror`` and per-stage tracing into ``registry`` work as in the
+    threaded engine, through the same core helpers. Cache and mirror reads
+    and writes are blocking SQLite calls, so they run on ``io_workers``
+    threads of their own and never stall the event loop.
+
+    Use as ``async with AsyncLookupEngine() as engine: ...``, or call
+    close() when done.
+    """
+
+    PLATE_LIMITS = PLATE_LIMITS
+
+    def __init__(self, cache_dir="cache", cache_ttl=resources.CACHE_TTL, max_connections=50, concurrency=200,
+                 connect_timeout=5.0, read_timeout=30.0, retries=3, backoff=0.5, backoff_max=10.0,
+                 cache=None, cache_backend="sqlite", catalog=None, policies=None, default_policy=None,
+                 fulltext_fallback=True, base_url=resources.BASE_URL, scheduler=None, priority=BATCH,
+                 mirror=None, registry=None, io_workers=4):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.scheduler = scheduler or get_client().scheduler
+        self.priority = priority
+        self._owns_cache = cache is None
+        self.cache = cache or open_cache(cache_backend, cache_dir, ttl=cache_ttl)
+        self.catalog = catalog if catalog is not None else ModelCatalog()
+        self.default_policy = default_policy or CachePolicy(ttl=cache_ttl)
+        self.policies = dict(policies or {})
+        self.mirror = mirror
+        self.metrics = registry or metrics.REGISTRY
+        self.fulltext_fallback = fulltext_fallback
+        self.unprojected = set()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="aio-io")
+        self._session = None
+        self._models = {}
+        self._background = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        for task in list(self._background):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.io_pool.shutdown(wait=True, cancel_futures=True)
+        if self._owns_cache:
+            self.cache.close()
+
+    # Run a blocking cache or mirror call on the I/O threads
+    async def blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, fn, *args)
+
+    # One datastore_search call with jittered retries on 429/5xx and connection errors
+    async def request(self, params):
+        # aiohttp only takes str/int query values
+        params = {k: str(v) for k, v in params.items()}
+        attempt = 0
+        while True:
+            started = await self.scheduler.acquire_async(self.priority)
+            status = None
+            try:
+                async with self.session().get(self.base_url, params=params) as response:
+                    status = response.status
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        delay = retry_delay(attempt, self.backoff, self.backoff_max,
+                                            response.headers.get("Retry-After"))
+                    else:
+                        body = await response.read()
+                        metrics.note(requests=1, bytes=len(body))
+                        if response.status in RETRY_STATUSES or response.status >= 500:
+                            response.raise_for_status()
+                        parse_started = time.perf_counter()
+                        data = await response.json(content_type=None)
+                        metrics.note(parse_seconds=time.perf_counter() - parse_started)
+                        return data
+            except asyncio.CancelledError:
+                self.scheduler.discard()
+                started = None
+                raise
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    metrics.note(requests=1)
+                    raise
+                delay = retry_delay(attempt, self.backoff, self.backoff_max)
+            finally:
+                # 429/5xx and failures shrink the shared concurrency limit, as for threaded calls
+                if started is not None:
+                    self.scheduler.release(started, status)
+            metrics.note(requests=1, retries=1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # One datastore_search call, projected to the columns we use
+    async def search(self, resource, params):
+        fields = resources.FIELDS.get(resource)
+        if fields and resource not in self.unprojected:
+            data = await self.request(dict(params, fields=",".join(fields)))
+            if not rejects_projection(data, fields):
+                return slim(data, fields)
+            self.unprojected.add(resource)
+        return slim(await self.request(params), fields)
+
+    # Answer from the cache by the namespace's policy, awaiting load() when needed
+    async def cached(self, namespace, key, load):
+        entry = await self.blocking(self.cache.get_entry, namespace, key)
+        state = cache_state(entry, self.policies.get(namespace, self.default_policy))
+        if state == "fresh":
+            metrics.note(cache="hit")
+            return entry[0]
+        if state == "stale":
+            metrics.note(cache="stale")
+            self.revalidate(namespace, key, load)
+            return entry[0]
+        metrics.note(cache="miss")
+        data = await load()
+        await self.blocking(self.cache.set, namespace, key, data)
+        return data
+
+    # Refresh a stale entry in the background, once per key at a time
+    def revalidate(self, namespace, key, load):
+        name = f"refresh:{namespace}:{key}"
+        if any(t.get_name() == name for t in self._background):
+            return
+
+        async def refresh():
+            # Not part of the lookup that found the entry stale
+            with metrics.activate(None):
+                try:
+                    await self.blocking(self.cache.set, namespace, key, await load())
+                except Exception:
+                    pass  # keep serving the stale entry; the next read tries again
+
+        task = asyncio.create_task(refresh(), name=name)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def query(self, namespace, key, resource, params):
+        return await self.cached(namespace, key, lambda: self.search(resource, params))
+
+    # Plate-keyed query: exact filter, full-text only if CKAN rejects the filter
+    async def query_plate(self, namespace, resource, plate):
+        limit = self.PLATE_LIMITS[resource]
+
+        async def load():
+            records, path = [], "miss"
+            for step, params in plan_plate_query(resource, plate, limit, self.fulltext_fallback):
+                data = await self.search(resource, params)
+                if rejected(data):
+                    continue
+                records = plate_records(resource, plate, step, get_records(data))
+                if records:
+                    path = step
+                # A query that ran and found nothing is the answer, not a reason to try q
+                break
+            return plate_entry(records, path)
+
+        return get_records(await self.cached(namespace, plate, load))
+
+    def mirrored(self, resource):
+        return self.mirror is not None and self.mirror.has(resource)
+
+    async def fetch_vehicle(self, plate):
+        with metrics.stage("vehicle"):
+            if self.mirrored("vehicle"):
+                metrics.note(cache="mirror")
+                return await self.blocking(self.mirror.find_plate, "vehicle", plate)
+            return await self.query_plate("veh", "vehicle", plate)
+
+    async def fetch_personal(self, plate):
+        with metrics.stage("fallback"):
+            if self.mirrored("personal"):
+                metrics.note(cache="mirror")
+                return await self.blocking(self.mirror.find_plate, "personal", plate, 1)
+            return await self.query_plate("personal", "personal", plate)
+
+    async def fetch_price(self, degem_cd, tozeret_cd):
+        with metrics.stage("price"):
+            if self.mirrored("price"):
+                metrics.note(cache="mirror")
+                return await self.blocking(self.mirror.find_model, "price", degem_cd, tozeret_cd)
+            key, params = price_query(degem_cd, tozeret_cd)
+            return get_records(await self.query("price", key, "price", params))
+
+    async def fetch_details(self, degem_cd, tozeret_cd, shnat_yitzur):
+        with metrics.stage("details"):
+            if self.mirrored("details"):
+                metrics.note(cache="mirror")
+                return await self.blocking(self.mirror.find_model, "details", degem_cd, tozeret_cd, shnat_yitzur)
+            key, params = details_query(degem_cd, tozeret_cd, shnat_yitzur)
+            return get_records(await self.query("details", key, "details", params))
+
+    async def fetch_disability(self, plate):
+        with metrics.stage("disability"):
+            if self.mirrored("disability"):
+                metrics.note(cache="mirror")
+                return await self.blocking(self.mirror.find_plate, "disability", plate, 5)
+            return await self.query_plate("disability", "disability", plate)
+
+    async def find_vehicle(self, plate):
+        records = await self.fetch_vehicle(plate)
+        if records:
+            return records[0]
+
+        personal_records = await self.fetch_personal(plate)
+        if personal_records:
+            return personal_record(personal_records)
+
+        raise NoDataFound(f"No data found for plate {plate}")
+
+    # Model data from the catalog; concurrent lookups of one model share a single load
+    async def model_info(self, degem_cd, tozeret_cd, shnat_yitzur):
+        key = model_key(degem_cd, tozeret_cd, shnat_yitzur)
+        model = self.catalog.get(key)
+        if model is not None:
+            return model
+
+        task = self._models.get(key)
+        if task is None:
+            async def load():
+                try:
+                    price_records, details_records = await asyncio.gather(
+                        self.fetch_price(degem_cd, tozeret_cd),
+                        self.fetch_details(degem_cd, tozeret_cd, shnat_yitzur),
+                    )
+                    model = build_model(price_records, details_records)
+                    self.catalog.put(key, model, model_ttl(model, self.policies, self.default_policy))
+                    return model
+                finally:
+                    del self._models[key]
+
+            task = self._models[key] = asyncio.ensure_future(load())
+        return await asyncio.shield(task)
+
+    # Pass a metrics.Trace to get this lookup's per-stage timings back
+    async def lookup(self, plate, trace=None):
+        plate = normalize_plate(plate)
+        trace = trace if trace is not None else metrics.Trace()
+        trace.plate = plate
+        try:
+            with metrics.activate(trace):
+                async with self.semaphore:
+                    disability = asyncio.ensure_future(self.fetch_disability(plate))
+                    try:
+                        record = await self.find_vehicle(plate)
+                        model = await self.model_info(*model_of(record))
+                        disability_records = await disability
+                    except BaseException:
+                        disability.cancel()
+                        raise
+                    return build_result(record, model, disability_records)
+        finally:
+            trace.finish()
+            self.metrics.record(trace)
+
+    async def _lookup_one(self, plate):
+        try:
+            return {"plate": plate, "ok": True, "result": await self.lookup(plate)}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {"plate": plate, "ok": False, "error": str(e)}
+
+    async def lookup_many(self, plates, max_pending=None):
+        """Yield {"plate", "ok", "result"/"error"} dicts as lookups finish.
+
+        ``plates`` may be a normal or an async iterable; at most
+        ``max_pending`` (default: twice the pool size) are taken ahead of
+        the results, so memory stays flat for any input size.
+        """
+        max_pending = max_pending or self.max_connections * 2
+        if hasattr(plates, "__aiter__"):
+            source = plates.__aiter__()
+        else:
+            source = iter(plates)
+
+        async def next_plate():
+            if hasattr(source, "__anext__"):
+                try:
+                    return await source.__anext__()
+                except StopAsyncIteration:
+                    return None
+            return next(source, None)
+
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    plate = await next_plate()
+                    if plate is None:
+                        exhausted = True
+                    else:
+                        pending.add(asyncio.ensure_future(self._lookup_one(plate)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+async def lookup(plate, engine=None):
+    if engine is not None:
+        return await engine.lookup(plate)
+    async with AsyncLookupEngine() as engine:
+        return await engine.lookup(plate)
+
+
+async def lookup_many(plates, engine=None, **kwargs):
+    if engine is not None:
+        async for res in engine.lookup_many(plates):
+            yield res
+        return
+    async with AsyncLookupEngine(**kwargs) as engine:
+        async for res in engine.lookup_many(plates):
+            yield res
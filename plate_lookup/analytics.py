@@ -0,0 +1,264 @@
+import argparse, json, os, sys, time
+
+from .records import MISSING
+
+# Columns a fleet can be grouped by, and the record field behind each
+GROUP_FIELDS = {"manufacturer": "tozeret_nm", "year": "shnat_yitzur", "fuel": "sug_delek_nm"}
+PERCENTILES = (10, 25, 75, 90)
+
+# Which end of a model's importer price range values a vehicle
+PRICE_BASIS = ("mid", "min", "max")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("fleet analytics needs numpy (pip install numpy)") from None
+    return numpy
+
+
+# Vectorized core.parse_price(): float64 array, NaN where a value isn't a price
+def parse_prices(values):
+    np = _numpy()
+    try:
+        # Numbers and plain numeric strings convert in one step
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    text = np.char.strip(np.char.replace(np.asarray(values, dtype=object).astype(str), ",", ""))
+    valid = np.char.isdigit(np.char.replace(text, ".", "", 1))
+    prices = np.full(len(text), np.nan)
+    prices[valid] = text[valid].astype(np.float64)
+    return prices
+
+
+# Integer codes for a column of labels, plus the sorted label table they index
+def encode_labels(values):
+    np = _numpy()
+    labels, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return codes, labels
+
+
+def _label(value):
+    return "" if value is None or value is MISSING else str(value)
+
+
+class Fleet:
+    """Columnar (NumPy) view of many vehicles, for valuation summaries.
+
+    Manufacturer, year and fuel type are held as integer codes into a
+    label table each, and the importer price range of every vehicle's model
+    as two float arrays (NaN where the model has no price). summary()
+    aggregates any combination of those columns in a single sort.
+
+    Build one from lookup results with from_results(), or straight from
+    the offline mirror's vehicle and price resources with from_mirror().
+    """
+
+    def __init__(self, manufacturer, year, fuel, min_price, max_price):
+        np = _numpy()
+        self.columns = {}
+        for name, values in (("manufacturer", manufacturer), ("year", year), ("fuel", fuel)):
+            self.columns[name] = encode_labels(values)
+        self.min_price = np.asarray(min_price, dtype=np.float64)
+        self.max_price = np.asarray(max_price, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.min_price)
+
+    # Lookup results: VehicleRecords, lookup() dicts or bulk output lines (failed lines are skipped)
+    @classmethod
+    def from_results(cls, results):
+        manufacturer, year, fuel, low, high = [], [], [], [], []
+        for item in results:
+            if isinstance(item, dict) and "record" not in item:
+                if not item.get("ok"):
+                    continue
+                item = item["result"]
+            if isinstance(item, dict):
+                record = item["record"]
+                read = record.get
+                low.append(item.get("min_price"))
+                high.append(item.get("max_price"))
+            else:
+                read = lambda name, default=None, rec=item: getattr(rec, name, default)
+                low.append(getattr(item, "min_price", None))
+                high.append(getattr(item, "max_price", None))
+            manufacturer.append(_label(read("tozeret_nm")))
+            year.append(_label(read("shnat_yitzur")))
+            fuel.append(_label(read("sug_delek_nm")))
+        np = _numpy()
+        low, high = parse_prices(low), parse_prices(high)
+        # A zero range is how a lookup reports a model without price rows
+        unpriced = (low == 0) & (high == 0)
+        low[unpriced] = high[unpriced] = np.nan
+        return cls(manufacturer, year, fuel, low, high)
+
+    # Every vehicle in the mirror, priced from the mirror's price rows in one pass over each resource
+    @classmethod
+    def from_mirror(cls, store):
+        np = _numpy()
+        models, mehir = [], []
+        for degem_cd, tozeret_cd, _, rec in store.scan("price"):
+            models.append(f"{degem_cd}_{tozeret_cd}")
+            mehir.append(rec.get("mehir"))
+        prices = parse_prices(mehir)
+        models = np.asarray(models, dtype=str)
+        priced = ~np.isnan(prices)
+        model_keys, model_codes = np.unique(models[priced], return_inverse=True)
+        model_min = np.full(len(model_keys), np.inf)
+        model_max = np.full(len(model_keys), -np.inf)
+        np.minimum.at(model_min, model_codes, prices[priced])
+        np.maximum.at(model_max, model_codes, prices[priced])
+
+        manufacturer, year, fuel, keys = [], [], [], []
+        for degem_cd, tozeret_cd, shnat_yitzur, rec in store.scan("vehicle"):
+            keys.append(f"{degem_cd}_{tozeret_cd}")
+            manufacturer.append(_label(rec.get("tozeret_nm")))
+            year.append(shnat_yitzur or "")
+            fuel.append(_label(rec.get("sug_delek_nm")))
+        keys = np.asarray(keys, dtype=str)
+        at = np.searchsorted(model_keys, keys)
+        found = at < len(model_keys)
+        found[found] = model_keys[at[found]] == keys[found]
+        low, high = np.full(len(keys), np.nan), np.full(len(keys), np.nan)
+        low[found], high[found] = model_min[at[found]], model_max[at[found]]
+        return cls(manufacturer, year, fuel, low, high)
+
+    def values(self, basis="mid"):
+        if basis == "min":
+            return self.min_price
+        if basis == "max":
+            return self.max_price
+        if basis == "mid":
+            return (self.min_price + self.max_price) / 2
+        raise ValueError(f"Unknown price basis: {basis}")
+
+    # Per-group vehicle count, priced count, total, mean, median and percentiles of the vehicle value
+    def summary(self, by=("manufacturer",), basis="mid", percentiles=PERCENTILES):
+        np = _numpy()
+        by = (by,) if isinstance(by, str) else tuple(by)
+        unknown = [name for name in by if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown group column(s): {', '.join(unknown)}")
+        if not len(self):
+            return []
+
+        # One integer key per combination of the grouping columns
+        codes = np.stack([self.columns[name][0] for name in by], axis=1)
+        groups, group_codes = np.unique(codes, axis=0, return_inverse=True)
+        group_codes = group_codes.reshape(-1)
+        vehicles = np.bincount(group_codes, minlength=len(groups))
+
+        values = self.values(basis)
+        priced = ~np.isnan(values)
+        g, v = group_codes[priced], values[priced]
+        order = np.lexsort((v, g))
+        g, v = g[order], v[order]
+        present = np.flatnonzero(np.bincount(g, minlength=len(groups)))
+        starts = np.searchsorted(g, present)
+        counts = np.diff(np.append(starts, len(v)))
+        totals = np.add.reduceat(v, starts) if len(v) else np.zeros(0)
+
+        # Linear-interpolated quantiles straight from each group's sorted run
+        def quantile(q):
+            pos = starts + (counts - 1) * q
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.minimum(lo + 1, starts + counts - 1)
+            return v[lo] + (v[hi] - v[lo]) * (pos - lo)
+
+        stats = {"median": quantile(0.5), **{f"p{p}": quantile(p / 100) for p in percentiles}}
+        priced_at = {int(group): i for i, group in enumerate(present)}
+        out = []
+        for i, combo in enumerate(groups):
+            row = {name: str(self.columns[name][1][code]) for name, code in zip(by, combo)}
+            row["vehicles"] = int(vehicles[i])
+            j = priced_at.get(i)
+            row["priced"] = int(counts[j]) if j is not None else 0
+            row["total"] = float(totals[j]) if j is not None else 0.0
+            row["mean"] = float(totals[j] / counts[j]) if j is not None else None
+            for name, column in stats.items():
+                row[name] = float(column[j]) if j is not None else None
+            out.append(row)
+        out.sort(key=lambda row: row["total"], reverse=True)
+        return out
+
+    # Fleet-wide totals, as one summary row
+    def totals(self, basis="mid", percentiles=PERCENTILES):
+        np = _numpy()
+        values = self.values(basis)
+        priced = values[~np.isnan(values)]
+        row = {"vehicles": len(self), "priced": len(priced), "total": float(priced.sum())}
+        if len(priced):
+            row["mean"] = float(priced.mean())
+            row["median"] = float(np.median(priced))
+            for p in percentiles:
+                row[f"p{p}"] = float(np.percentile(priced, p))
+        return row
+
+
+def format_summary(rows, by):
+    cols = list(by) + ["vehicles", "priced", "total", "median"] + [f"p{p}" for p in PERCENTILES]
+    lines = ["\t".join(cols)]
+    for row in rows:
+        cells = []
+        for col in cols:
+            value = row.get(col)
+            if isinstance(value, float):
+                value = f"{value:,.0f}"
+            cells.append("" if value is None else str(value))
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plate_lookup.analytics",
+                                     description="Fleet valuation: importer price totals and percentiles per group.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("input", nargs="?", help="bulk lookup output (JSONL, as written by python -m plate_lookup); '-' for stdin")
+    source.add_argument("--mirror", nargs="?", const=os.path.join("cache", "mirror.db"),
+                        help="summarize every vehicle in the offline mirror (default: cache/mirror.db)")
+    parser.add_argument("--by", default="manufacturer",
+                        help=f"comma-separated group columns: {', '.join(GROUP_FIELDS)} (default: manufacturer)")
+    parser.add_argument("--basis", choices=PRICE_BASIS, default="mid",
+                        help="value each vehicle at its model's lowest, highest or mid importer price (default: mid)")
+    parser.add_argument("--top", type=int, default=None, help="only the N groups with the highest total")
+    parser.add_argument("--json", action="store_true", help="write JSON instead of a tab-separated table")
+    args = parser.parse_args(argv)
+    by = [name.strip() for name in args.by.split(",") if name.strip()]
+    unknown = [name for name in by if name not in GROUP_FIELDS]
+    if unknown:
+        parser.error(f"unknown group column(s): {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    if args.mirror:
+        from .mirror import MirrorStore
+        store = MirrorStore(args.mirror)
+        try:
+            fleet = Fleet.from_mirror(store)
+        finally:
+            store.close()
+    else:
+        f = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        try:
+            fleet = Fleet.from_results(json.loads(line) for line in f if line.strip())
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    loaded = time.perf_counter()
+    rows = fleet.summary(by, args.basis)[:args.top]
+    totals = fleet.totals(args.basis)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({"by": by, "basis": args.basis, "totals": totals, "groups": rows}, ensure_ascii=False, indent=2))
+    else:
+        print(format_summary(rows, by))
+    print(f"{totals['vehicles']} vehicles ({totals['priced']} priced), total ₪{totals['total']:,.0f}, "
+          f"loaded in {loaded - started:.1f}s, summarized in {elapsed - (loaded - started):.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
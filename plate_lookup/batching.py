@@ -0,0 +1,167 @@
+import json, queue, threading, time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import cancel, metrics, resources
+from .mirror import norm_key
+from .planner import filter_value
+
+
+class PlateBatcher:
+    """Coalesces single-plate queries on one resource into multi-plate requests.
+
+    ``search`` runs one datastore_search call (params -> response dict).
+    Lookups call fetch(plate) and block; a dispatcher thread gathers the
+    plates waiting at that moment (up to ``batch_size``, or whatever arrives
+    within ``max_wait`` seconds) into one ``filters={plate_column: [...]}``
+    request and hands each waiter the rows for its own plate. Rows from a
+    multi-plate query are authoritative: a plate with none wasn't found. If
+    CKAN rejects the query itself, every waiter gets None instead.
+
+    The batch size adapts: it grows while full batches come back faster than
+    ``target_latency`` and is halved on errors or slow responses.
+
+    The requests, retries and bytes of a batch are noted on the trace and
+    stage of every lookup waiting on it, each taking an equal share.
+    """
+
+    def __init__(self, search, resource, per_plate_limit=10, batch_size=50, min_size=1, max_size=500,
+                 max_wait=0.02, target_latency=2.0, max_inflight=4):
+        self.search = search
+        self.resource = resource
+        self.column = resources.PLATE_COLUMNS[resource]
+        self.per_plate_limit = per_plate_limit
+        self.batch_size = batch_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.target_latency = target_latency
+        self.max_inflight = max_inflight
+
+        self.requests = 0
+        self.plates = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pool = None
+
+    def fetch(self, plate):
+        fut = Future()
+        self._start()
+        self._queue.put((plate, fut, metrics.bind(metrics.note)))
+        return cancel.result(fut)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_inflight,
+                                                thread_name_prefix=f"batch-{self.resource}")
+                self._thread = threading.Thread(target=self._run, args=(self._pool,),
+                                                name=f"batcher-{self.resource}", daemon=True)
+                self._thread.start()
+
+    def _run(self, pool):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            pool.submit(self._resolve, batch)
+
+    # Fetch every row for the given plates, paging if a response was cut at the limit; None if CKAN rejects the query
+    def _request(self, plates):
+        filters = json.dumps({self.column: [filter_value(p) for p in plates]})
+        limit = min(32000, len(plates) * self.per_plate_limit)
+        rows, offset = [], 0
+        while True:
+            params = {"resource_id": resources.RESOURCES[self.resource], "filters": filters,
+                      "limit": limit, "offset": offset}
+            data = self.search(params)
+            with self._lock:
+                self.requests += 1
+            if data.get("success") is False:
+                return None
+            records = data.get("result", {}).get("records", [])
+            rows.extend(records)
+            if len(records) < limit:
+                return rows
+            offset += limit
+
+    def _resolve(self, batch):
+        waiters = defaultdict(list)
+        for plate, fut, _ in batch:
+            waiters[norm_key(plate)].append(fut)
+
+        started = time.monotonic()
+        trace, error = metrics.Trace(), None
+        try:
+            with metrics.activate(trace), trace.stage("batch"):
+                rows = self._request(list(waiters))
+        except Exception as e:
+            error = e
+        # Before any waiter wakes up and finishes its trace
+        self._share(batch, trace)
+        if error is not None:
+            self._adapt(len(waiters), None)
+            for futs in waiters.values():
+                for fut in futs:
+                    fut.set_exception(error)
+            return
+        self._adapt(len(waiters), time.monotonic() - started)
+        if rows is None:
+            for futs in waiters.values():
+                for fut in futs:
+                    fut.set_result(None)
+            return
+
+        grouped = defaultdict(list)
+        for rec in rows:
+            grouped[norm_key(rec.get(self.column))].append(rec)
+        with self._lock:
+            self.plates += len(batch)
+        for key, futs in waiters.items():
+            for fut in futs:
+                # Every waiter gets its own copies; the lookup pipeline mutates records
+                fut.set_result([dict(r) for r in grouped.get(key, [])[:self.per_plate_limit]])
+
+    # Split what the batch cost upstream between the lookups that waited on it
+    def _share(self, batch, trace):
+        counts = {key: trace.count("batch", key) / len(batch) for key in ("requests", "retries")}
+        counts["bytes"] = trace.count("batch", "bytes") // len(batch)
+        for _, _, note in batch:
+            note(**counts)
+
+    def _adapt(self, size, latency):
+        with self._lock:
+            if latency is None or latency > self.target_latency:
+                self.batch_size = max(self.min_size, self.batch_size // 2)
+            elif size >= self.batch_size:
+                self.batch_size = min(self.max_size, self.batch_size * 2)
+
+    def stats(self):
+        with self._lock:
+            return {"resource": self.resource, "requests": self.requests, "plates": self.plates,
+                    "batch_size": self.batch_size}
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            pool, self._pool = self._pool, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+            pool.shutdown(wait=True)
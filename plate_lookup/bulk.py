@@ -0,0 +1,81 @@
+import csv, json, sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from .core import LookupEngine
+from .metrics import Trace
+from .records import VehicleRecord
+
+
+# Yield plates from a CSV/JSONL/plain text file ("-" reads stdin) one at a time
+def read_plates(path, column="plate"):
+    f = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8-sig', newline='')
+    try:
+        if path.endswith(".jsonl") or path.endswith(".ndjson"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    plate = row.get(column) if isinstance(row, dict) else row
+                    if plate not in (None, ""):
+                        yield str(plate).strip()
+        elif path.endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if column in header:
+                idx = header.index(column)
+            else:
+                # No header row; the first column holds the plates
+                idx = 0
+                if header and header[0].strip():
+                    yield header[0].strip()
+            for row in reader:
+                if len(row) > idx and row[idx].strip():
+                    yield row[idx].strip()
+        else:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _lookup_one(engine, plate, trace=False, compact=False, token=None):
+    tr = Trace() if trace else None
+    try:
+        result = engine.lookup(plate, tr, token)
+        res = {"plate": plate, "ok": True, "result": VehicleRecord.from_result(result) if compact else result}
+    except Exception as e:
+        res = {"plate": plate, "ok": False, "error": str(e)}
+    if tr is not None:
+        res["trace"] = tr.to_dict()
+    return res
+
+
+def bulk_lookup(plates, workers=8, engine=None, max_pending=None, trace=False, compact=False, token=None):
+    """Look up many plates concurrently, yielding results as they finish.
+
+    Only ``max_pending`` plates (default: twice the worker count) are read
+    from ``plates`` ahead of the results, so memory stays flat for any input
+    size. Results come out in completion order, not input order. With
+    ``trace=True`` each result also carries its per-stage timings. With
+    ``compact=True`` results are VehicleRecords instead of dicts, for
+    callers that keep large result sets in memory. Cancelling ``token`` (a
+    cancel.CancelToken) aborts the lookups in flight; stop iterating to
+    stop reading plates.
+    """
+    engine = engine or LookupEngine()
+    max_pending = max_pending or workers * 2
+    plates = iter(plates)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_lookup_one, engine, p, trace, compact, token) for p in islice(plates, max_pending)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+            for p in islice(plates, len(done)):
+                pending.add(pool.submit(_lookup_one, engine, p, trace, compact, token))
@@ -0,0 +1,246 @@
+import json, os, sqlite3, tempfile, threading, time, zlib
+
+from . import resources
+
+
+# Compact encoding for cache values: minimal JSON, zlib-compressed
+def encode(value):
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class CachePolicy:
+    """Freshness rules for one cache namespace.
+
+    Entries younger than ``ttl`` are fresh (``negative_ttl`` for entries
+    that found no records). For ``stale_ttl`` seconds after that an entry
+    is still served at once while it is refreshed in the background.
+    """
+
+    def __init__(self, ttl=resources.CACHE_TTL, negative_ttl=6 * 3600, stale_ttl=resources.CACHE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+    def state(self, age, negative):
+        ttl = self.negative_ttl if negative else self.ttl
+        if age < ttl:
+            return "fresh"
+        if age < ttl + self.stale_ttl:
+            return "stale"
+        return "expired"
+
+
+class LocalConnections:
+    """One SQLite connection per thread for a database file.
+
+    Connections of threads that have exited are closed the next time a new
+    thread connects, so short-lived worker threads don't leak handles.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; multi-statement writes open their own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                for thread, old in self._conns:
+                    if not thread.is_alive():
+                        old.close()
+                self._conns = [c for c in self._conns if c[0].is_alive()]
+                self._conns.append((threading.current_thread(), conn))
+        return conn
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for _, conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+class FileCache:
+    """Legacy backend: one JSON file per query, cache/<namespace>_<key>.json.
+
+    Freshness is judged by file mtime, like the original DataFetcher cache.
+    """
+
+    def __init__(self, cache_dir="cache", ttl=resources.CACHE_TTL, ttls=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, namespace, key):
+        return os.path.join(self.cache_dir, f"{namespace}_{key}.json")
+
+    def get(self, namespace, key):
+        entry = self.get_entry(namespace, key)
+        if entry is None or time.time() - entry[1] >= self.ttls.get(namespace, self.ttl):
+            return None
+        return entry[0]
+
+    # (value, created timestamp) regardless of age, or None
+    def get_entry(self, namespace, key):
+        path = self.path(namespace, key)
+        try:
+            created = os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f), created
+        except (OSError, ValueError):
+            return None
+
+    def set(self, namespace, key, value):
+        # Write to a temp file and rename it over the old one, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path(namespace, key))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def close(self):
+        pass
+
+
+class SQLiteCache:
+    """All cache entries in one indexed SQLite file.
+
+    Values are stored compressed, each namespace ("veh", "price", ...) can
+    have its own TTL, and the file is kept under ``max_bytes`` by evicting
+    the least recently used entries. WAL mode plus a busy timeout make it
+    safe to share between threads (one connection per thread) and between
+    processes.
+    """
+
+    # Only refresh an entry's access time this often, so hot reads don't turn into writes
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path=os.path.join("cache", "cache.db"), ttl=resources.CACHE_TTL, ttls=None,
+                 max_bytes=512 * 1024 * 1024, evict_every=200):
+        self.path = path
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._conns = LocalConnections(path)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _conn(self):
+        return self._conns.get()
+
+    def get(self, namespace, key):
+        entry = self.get_entry(namespace, key)
+        if entry is None or time.time() - entry[1] >= self.ttls.get(namespace, self.ttl):
+            return None
+        return entry[0]
+
+    # (value, created timestamp) regardless of age, or None
+    def get_entry(self, namespace, key):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, created, accessed FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, str(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        value, created, accessed = row
+        now = time.time()
+        if now - accessed >= self.TOUCH_INTERVAL:
+            with conn:
+                conn.execute("UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                             (now, namespace, str(key)))
+        return decode(value), created
+
+    def set(self, namespace, key, value):
+        blob = encode(value)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created, accessed, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, str(key), blob, now, now, len(blob)),
+            )
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    # Drop least recently used entries until the store is back under 90% of max_bytes
+    def evict(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            excess = total - int(self.max_bytes * 0.9)
+            if total <= self.max_bytes or excess <= 0:
+                return 0
+            removed = 0
+            for namespace, key, size in conn.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY accessed").fetchall():
+                if excess <= 0:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                excess -= size
+                removed += 1
+            return removed
+
+    def purge_expired(self):
+        conn = self._conn()
+        now = time.time()
+        custom = list(self.ttls)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(
+                f"DELETE FROM entries WHERE created <= ? AND namespace NOT IN ({','.join('?' * len(custom))})",
+                [now - self.ttl] + custom,
+            ).rowcount
+            for namespace, ttl in self.ttls.items():
+                removed += conn.execute("DELETE FROM entries WHERE namespace = ? AND created <= ?",
+                                        (namespace, now - ttl)).rowcount
+        return removed
+
+    def close(self):
+        self._conns.close()
+
+
+# Build a cache backend by name: "sqlite" (default) or "legacy" (one file per query)
+def open_cache(backend="sqlite", cache_dir="cache", ttl=resources.CACHE_TTL, ttls=None, **kwargs):
+    if backend == "sqlite":
+        return SQLiteCache(os.path.join(cache_dir, "cache.db"), ttl=ttl, ttls=ttls, **kwargs)
+    if backend == "legacy":
+        return FileCache(cache_dir, ttl=ttl, ttls=ttls)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,119 @@
+import threading, time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Cooperative cancellation of one lookup, or of a group of them.
+
+    Code running under activate(token), including stage pool work wrapped
+    with bind(), checks the token between stages and retries, stops waiting
+    for scheduler slots, backoff and in-flight requests once it is
+    cancelled, and raises Cancelled.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled("Lookup cancelled")
+
+    # time.sleep() that raises Cancelled as soon as the token is cancelled
+    def sleep(self, seconds):
+        if self._event.wait(seconds):
+            raise Cancelled("Lookup cancelled")
+
+    # Call fn on cancel (at once if already cancelled); returns a function that unregisters it
+    def on_cancel(self, fn):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._remove(fn)
+        fn()
+        return lambda: None
+
+    def _remove(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+
+# The token active on this thread, or None
+def current():
+    return getattr(_local, "token", None)
+
+
+def check():
+    token = current()
+    if token is not None:
+        token.check()
+
+
+def sleep(seconds):
+    token = current()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+@contextmanager
+def activate(token):
+    previous = current()
+    _local.token = token if token is not None else previous
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+# Wrap fn so that, run on another thread, it sees this thread's token
+def bind(fn):
+    token = current()
+    if token is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        with activate(token):
+            return fn(*args, **kwargs)
+
+    return bound
+
+
+# fut.result(), but raises Cancelled as soon as the active token is cancelled.
+# The future itself is left alone; work bound to the token stops on its own.
+def result(fut):
+    token = current()
+    if token is None:
+        return fut.result()
+    stop = Future()
+    remove = token.on_cancel(lambda: stop.set_result(None))
+    try:
+        wait([fut, stop], return_when=FIRST_COMPLETED)
+    finally:
+        remove()
+    if not fut.done():
+        token.check()
+    return fut.result()
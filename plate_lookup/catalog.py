@@ -0,0 +1,106 @@
+import threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from . import cancel
+
+
+class ModelCatalog:
+    """In-process LRU of parsed model data, keyed by (degem_cd, tozeret_cd, shnat_yitzur).
+
+    Importer price and model details don't depend on the plate, so every
+    plate of a model shares one entry. Concurrent lookups of a model that
+    isn't loaded yet wait for a single load instead of each fetching it.
+
+    Entries expire: each is kept for the ``ttl`` the caller gives when it is
+    loaded (the engines use the cache policy of the price and details
+    resources), and never longer than ``max_age`` seconds if that is set.
+    """
+
+    def __init__(self, maxsize=4096, max_age=None):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    # Live entry for key, or None; call with the lock held
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        model, expires = entry
+        if expires is not None and time.monotonic() >= expires:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    # Store model; ``ttl`` is seconds or a function of the model giving them (None: only max_age applies)
+    def _store(self, key, model, ttl):
+        if callable(ttl):
+            ttl = ttl(model)
+        if self.max_age is not None:
+            ttl = self.max_age if ttl is None else min(ttl, self.max_age)
+        self._entries[key] = (model, time.monotonic() + ttl if ttl is not None else None)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry[0]
+                fut = self._loading.get(key)
+                owner = fut is None
+                if owner:
+                    fut = self._loading[key] = Future()
+                    self.misses += 1
+                else:
+                    self.hits += 1
+
+            if owner:
+                break
+            try:
+                return cancel.result(fut)
+            except cancel.Cancelled:
+                cancel.check()  # this lookup was cancelled, not just the one loading the model
+
+        try:
+            model = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._store(key, model, ttl)
+        fut.set_result(model)
+        return model
+
+    # Plain LRU access, for callers that do their own load deduplication (the async engine)
+    def get(self, key):
+        with self._lock:
+            entry = self._lookup(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, model, ttl=None):
+        with self._lock:
+            self.misses += 1
+            self._store(key, model, ttl)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,117 @@
+import argparse, sys, time
+
+from .bulk import bulk_lookup, read_plates
+from .cache import CachePolicy
+from .core import LookupEngine
+from .export import open_exporter
+from .http_client import CkanClient
+from .mirror import MirrorStore
+from .scheduler import Scheduler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="plate_lookup",
+        description="Bulk Israeli license plate lookup against data.gov.il (no GUI).",
+    )
+    parser.add_argument("input", help="plate list: .csv, .jsonl or one plate per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file; .csv, .parquet, .arrow or JSONL (default: JSONL on stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet", "arrow"],
+                        help="output format (default: from the output file extension)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="rows buffered between writes (default: 1000, 10000 for Parquet/Arrow)")
+    parser.add_argument("--csv-headers", choices=["keys", "labels"], default="keys",
+                        help="CSV header row: column keys or Hebrew labels (default: keys)")
+    parser.add_argument("-c", "--column", default="plate", help="plate column/key in CSV or JSONL input")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="concurrent lookups (default: 8)")
+    parser.add_argument("--fanout", action="store_true", help="run the independent queries of each lookup concurrently")
+    parser.add_argument("--pool-size", type=int, default=None, help="kept-alive HTTP connections (default: 3x workers)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request read timeout in seconds (default: 30)")
+    parser.add_argument("--retries", type=int, default=3, help="retries on 429/5xx/connection errors (default: 3)")
+    parser.add_argument("--rate", type=float, default=15.0,
+                        help="upstream requests per second, shared by all workers (default: 15)")
+    parser.add_argument("--latency-mode", action="store_true",
+                        help="trade extra requests for lower tail latency: speculative personal-import queries "
+                             "and hedged duplicates of slow requests")
+    parser.add_argument("--hedge-percentile", type=float, default=95.0,
+                        help="with --latency-mode, duplicate requests slower than this percentile (default: 95)")
+    parser.add_argument("--cache-dir", default="cache", help="cache directory (default: cache)")
+    parser.add_argument("--cache-backend", choices=["sqlite", "legacy"], default="sqlite",
+                        help="sqlite: single indexed cache.db (default); legacy: one JSON file per query")
+    parser.add_argument("--negative-ttl", type=float, default=6.0,
+                        help="hours to trust a cached 'not found' answer (default: 6)")
+    parser.add_argument("--stale-ttl", type=float, default=168.0,
+                        help="hours an expired entry is still served while refreshed in the background (default: 168)")
+    parser.add_argument("--batch", action="store_true",
+                        help="coalesce plate queries of concurrent lookups into multi-plate requests (use with many workers)")
+    parser.add_argument("--batch-size", type=int, default=50, help="initial plates per batched request (default: 50)")
+    parser.add_argument("--no-fulltext-fallback", action="store_true",
+                        help="don't fall back to a full-text q search when CKAN rejects the exact filter")
+    parser.add_argument("--mirror", help="answer from a local mirror database built with plate_lookup.mirror")
+    parser.add_argument("--trace", action="store_true", help="add per-stage timings to every output line")
+    parser.add_argument("--metrics", help="write stage histograms to this file (.prom/.txt: Prometheus text, else JSON)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    client = CkanClient(pool_size=args.pool_size or args.workers * 3, read_timeout=args.timeout, retries=args.retries,
+                        scheduler=Scheduler(rate=args.rate),
+                        hedge_percentile=args.hedge_percentile if args.latency_mode else None)
+    engine = LookupEngine(args.cache_dir, fanout=args.fanout, stage_workers=args.workers * 3, client=client,
+                          cache_backend=args.cache_backend, mirror=MirrorStore(args.mirror) if args.mirror else None,
+                          batching=args.batch, batch_size=args.batch_size,
+                          fulltext_fallback=not args.no_fulltext_fallback, speculative=args.latency_mode,
+                          default_policy=CachePolicy(negative_ttl=args.negative_ttl * 3600,
+                                                     stale_ttl=args.stale_ttl * 3600))
+
+    # stdout keeps streaming line by line unless a chunk size is given
+    chunk_size = args.chunk_size or (1 if args.output == "-" else None)
+    out = open_exporter(args.output, args.format, chunk_size, args.csv_headers)
+    done = failed = 0
+    started = time.time()
+    try:
+        for res in bulk_lookup(read_plates(args.input, args.column), workers=args.workers, engine=engine,
+                               trace=args.trace):
+            out.write(res)
+            done += 1
+            if not res["ok"]:
+                failed += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        batch_stats = [b.stats() for b in engine.batchers.values()]
+        query_paths = dict(engine.query_paths)
+        catalog = engine.catalog
+        upstream = client.scheduler.stats()
+        speculation = dict(engine.speculation)
+        engine.close()
+        client.close()
+        out.close()
+        if args.metrics:
+            engine.metrics.dump(args.metrics)
+
+    elapsed = time.time() - started
+    print(f"{done} plates ({failed} failed) in {elapsed:.1f}s", file=sys.stderr)
+    print(f"model catalog: {len(catalog)} models, {catalog.hits} hits, {catalog.misses} loads", file=sys.stderr)
+    for (resource, path), count in sorted(query_paths.items()):
+        print(f"{resource}: {count} answered by {path}", file=sys.stderr)
+    for st in batch_stats:
+        print(f"{st['resource']}: {st['plates']} plates in {st['requests']} requests "
+              f"(batch size now {st['batch_size']})", file=sys.stderr)
+    print(f"upstream: {sum(upstream['granted'].values())} requests, concurrency limit {upstream['limit']}, "
+          f"{upstream['backoffs']} backoffs", file=sys.stderr)
+    if args.latency_mode:
+        # Extra upstream load: requests of unneeded speculative queries (cache hits cost nothing), plus hedged duplicates
+        unneeded = speculation.get("started", 0) - speculation.get("used", 0) - speculation.get("cancelled", 0)
+        wasted = speculation.get("unneeded_requests", 0)
+        print(f"latency mode: {speculation.get('started', 0)} speculative personal-import queries "
+              f"({speculation.get('used', 0)} used, {unneeded} unneeded, {wasted:g} requests to data.gov.il), "
+              f"{client.hedged} hedged requests ({client.hedge_wins} answered first); "
+              f"{wasted + client.hedged:g} extra upstream requests", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+import json, threading, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from . import cancel, metrics, resources
+from .batching import PlateBatcher
+from .cache import CachePolicy, open_cache
+from .catalog import ModelCatalog
+from .http_client import get_client
+from .planner import match_plate, normalize_plate, plan_plate_query
+
+
+class NoDataFound(Exception):
+    pass
+
+
+# Parse a CKAN "mehir" value, e.g. 120000, "120000" or "120,000"
+def parse_price(val):
+    if val is None:
+        return None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        try:
+            return float(str(val).replace(',', '').strip())
+        except ValueError:
+            return None
+
+
+# Wrap fn to run on a pool thread within this lookup's trace and cancel token
+def bound(fn):
+    return cancel.bind(metrics.bind(fn))
+
+
+def get_records(data):
+    return data.get("result", {}).get("records", [])
+
+
+# Keep only the records (and only ``fields`` of each) from a CKAN response; a rejected query stays marked
+def slim(data, fields=None):
+    records = get_records(data)
+    if fields:
+        records = [{k: rec[k] for k in fields if k in rec} for rec in records]
+    if rejected(data):
+        return {"success": False, "result": {"records": records}}
+    return {"result": {"records": records}}
+
+
+# Whether CKAN refused the query itself (a 4xx error body), as opposed to running it and finding no rows
+def rejected(data):
+    return data.get("success") is False
+
+
+# The helpers below hold the query and answer logic that LookupEngine and
+# aio.AsyncLookupEngine share; the engines only differ in how they wait for I/O.
+
+# Rows kept per plate for each plate-keyed resource
+PLATE_LIMITS = {"vehicle": 10, "personal": 1, "disability": 5}
+
+
+# Whether a projected query failed because the resource doesn't have the requested columns.
+# CKAN reports those as a validation error on "fields"; a bad filter or q value fails
+# the query just the same but says nothing about the projection.
+def rejects_projection(data, fields):
+    if data.get("success") is not False:
+        return False
+    error = data.get("error")
+    if not isinstance(error, dict):
+        return False
+    if error.get("fields"):
+        return True
+    message = str(error.get("message") or "")
+    return any(f'"{field}"' in message or f"'{field}'" in message for field in fields)
+
+
+# "fresh", "stale" or "miss" for a cache entry ((data, created) or None) under ``policy``
+def cache_state(entry, policy):
+    if entry is None:
+        return "miss"
+    data, created = entry
+    state = policy.state(time.time() - created, not get_records(data))
+    return "miss" if state == "expired" else state
+
+
+# Records of one plate query step; full-text hits are narrowed to the plate itself
+def plate_records(resource, plate, step, records):
+    return match_plate(resource, plate, records) if step == "q" else records
+
+
+# Cache value of a plate query, recording which step answered it
+def plate_entry(records, path):
+    return {"result": {"records": records}, "path": path}
+
+
+# Cache key and datastore_search params of a model's importer price rows
+def price_query(degem_cd, tozeret_cd):
+    filters = {"degem_cd": [degem_cd], "tozeret_cd": [tozeret_cd]}
+    return f"{degem_cd}_{tozeret_cd}", {"resource_id": resources.PRICE_RES, "filters": json.dumps(filters),
+                                        "limit": 100}
+
+
+def details_query(degem_cd, tozeret_cd, shnat_yitzur):
+    filters = {"degem_cd": [degem_cd], "tozeret_cd": [tozeret_cd], "shnat_yitzur": [shnat_yitzur]}
+    return f"{degem_cd}_{tozeret_cd}_{shnat_yitzur}", {"resource_id": resources.DETAILS_RES,
+                                                       "filters": json.dumps(filters), "limit": 100}
+
+
+# (degem_cd, tozeret_cd, shnat_yitzur) of a vehicle record
+def model_of(record):
+    return record.get("degem_cd", 0), record.get("tozeret_cd", 0), record.get("shnat_yitzur", None)
+
+
+# ModelCatalog key of a model
+def model_key(degem_cd, tozeret_cd, shnat_yitzur):
+    return str(degem_cd), str(tozeret_cd), str(shnat_yitzur)
+
+
+# Seconds a catalog entry of ``model`` stays valid: as long as the price and details cache entries behind it.
+# Called right after the model is built; if the running lookup's cache answered either from a stale entry,
+# the entry isn't kept at all, so the next lookup picks up the background refresh.
+def model_ttl(model, policies, default_policy):
+    trace = metrics.current()
+    if trace is not None and "stale" in (trace.cache_state("price"), trace.cache_state("details")):
+        return 0
+    price = policies.get("price", default_policy)
+    details = policies.get("details", default_policy)
+    return min(price.ttl if model["has_price_records"] else price.negative_ttl,
+               details.ttl if model["details"] else details.negative_ttl)
+
+
+# A personal-import row, used as the vehicle record
+def personal_record(personal_records):
+    record = personal_records[0]
+    record["personal_import"] = True
+    return record
+
+
+class LookupEngine:
+    """Qt-free plate lookup pipeline.
+
+    One engine can be shared between threads; every call to lookup() is
+    independent and only shares the HTTP client and the cache.
+
+    With ``fanout=True`` the independent queries of a lookup run concurrently
+    on a shared stage pool: the disability query starts together with the
+    vehicle query, and price/details start together once the model is known.
+
+    Given a ``mirror`` (MirrorStore), every resource loaded into it is
+    answered locally; resources the mirror doesn't hold still go to CKAN.
+
+    With ``batching=True`` the plate-keyed queries (vehicle, personal
+    import, disability) of concurrent lookups are coalesced into
+    multi-plate ``filters`` requests by one PlateBatcher per resource.
+
+    Plates are normalized before lookup, and plate-keyed resources are
+    queried with an exact filter on their key column. An exact query that
+    runs and finds nothing is a cached miss; full-text ``q`` is only tried
+    when CKAN rejects the exact filter. ``query_paths`` counts which path
+    answered.
+
+    Only the columns listed in resources.FIELDS are requested and cached.
+
+    Parsed price/details data is kept per model in a ModelCatalog (pass
+    ``catalog`` to share one between engines), for as long as the cache
+    policy of the price and details namespaces keeps those answers fresh.
+
+    Cache freshness follows a CachePolicy per namespace (``policies``
+    overrides ``default_policy``, itself built from ``cache_ttl`` if not given): misses expire sooner
+    than hits, and an entry past its TTL but inside the stale window is
+    returned immediately while a background refresh replaces it.
+
+    ``priority`` (a scheduler class such as scheduler.INTERACTIVE) sets the
+    queue this engine's upstream calls wait in; engines sharing a client
+    share its rate limit.
+
+    With ``speculative=True`` the personal-import fallback is queried
+    alongside the vehicle query instead of after it comes back empty; the
+    ``speculation`` counter records how many of those queries were started,
+    used, or cancelled before they ran, and in ``unneeded_requests`` how
+    many upstream requests the unused ones made (cache hits make none).
+
+    Every lookup is traced per stage (metrics.Trace) and aggregated into
+    ``registry`` (the process-wide metrics.REGISTRY by default).
+
+    lookup() takes an optional cancel.CancelToken; cancelling it aborts the
+    lookup's waits and in-flight requests and raises cancel.Cancelled.
+    """
+
+    PLATE_LIMITS = PLATE_LIMITS
+
+    def __init__(self, cache_dir="cache", cache_ttl=resources.CACHE_TTL, fanout=False, stage_workers=8,
+                 client=None, cache=None, cache_backend="sqlite", mirror=None, batching=False, batch_size=50,
+                 fulltext_fallback=True, catalog=None, policies=None,
+                 default_policy=None, priority=None, speculative=False, registry=None):
+        self.client = client or get_client()
+        if priority is not None:
+            self.client = self.client.with_priority(priority)
+        self._owns_cache = cache is None
+        self.cache = cache or open_cache(cache_backend, cache_dir, ttl=cache_ttl)
+        self.default_policy = default_policy or CachePolicy(ttl=cache_ttl)
+        self.policies = dict(policies or {})
+        self.mirror = mirror
+        self.fanout = fanout
+        self.stage_workers = stage_workers
+        self.batching = batching
+        self.batch_size = batch_size
+        self.batchers = {}
+        self.fulltext_fallback = fulltext_fallback
+        self.speculative = speculative
+        self.speculation = Counter()
+        self.metrics = registry or metrics.REGISTRY
+        self.query_paths = Counter()
+        self.unprojected = set()
+        self.catalog = catalog if catalog is not None else ModelCatalog()
+        self._stage_pool = None
+        self._refresh_pool = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def stage_pool(self):
+        with self._lock:
+            if self._stage_pool is None:
+                self._stage_pool = ThreadPoolExecutor(max_workers=self.stage_workers, thread_name_prefix="lookup-stage")
+            return self._stage_pool
+
+    def batcher(self, resource):
+        with self._lock:
+            if resource not in self.batchers:
+                search = lambda params: self.search(resource, params)
+                self.batchers[resource] = PlateBatcher(search, resource, self.PLATE_LIMITS[resource],
+                                                       batch_size=self.batch_size)
+            return self.batchers[resource]
+
+    def close(self):
+        with self._lock:
+            if self._stage_pool is not None:
+                self._stage_pool.shutdown(wait=False, cancel_futures=True)
+                self._stage_pool = None
+            if self._refresh_pool is not None:
+                self._refresh_pool.shutdown(wait=True, cancel_futures=True)
+                self._refresh_pool = None
+            batchers, self.batchers = list(self.batchers.values()), {}
+        for batcher in batchers:
+            batcher.close()
+        if self._owns_cache:
+            self.cache.close()
+
+    # One datastore_search call, projected to the columns we use
+    def search(self, resource, params):
+        fields = resources.FIELDS.get(resource)
+        if fields and resource not in self.unprojected:
+            data = self.client.search(dict(params, fields=",".join(fields)))
+            if not rejects_projection(data, fields):
+                return slim(data, fields)
+            # The resource rejected the projection (e.g. a renamed column); stop asking for it
+            self.unprojected.add(resource)
+        return slim(self.client.search(params), fields)
+
+    # Answer from the cache by the namespace's policy, calling load() when needed
+    def cached(self, namespace, key, load):
+        entry = self.cache.get_entry(namespace, key)
+        state = cache_state(entry, self.policies.get(namespace, self.default_policy))
+        if state == "fresh":
+            metrics.note(cache="hit")
+            return entry[0]
+        if state == "stale":
+            metrics.note(cache="stale")
+            self.revalidate(namespace, key, load)
+            return entry[0]
+        metrics.note(cache="miss")
+        data = load()
+        self.cache.set(namespace, key, data)
+        return data
+
+    # Refresh a stale entry in the background, once per key at a time
+    def revalidate(self, namespace, key, load):
+        with self._lock:
+            if (namespace, key) in self._refreshing:
+                return
+            self._refreshing.add((namespace, key))
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+            pool = self._refresh_pool
+
+        def refresh():
+            try:
+                self.cache.set(namespace, key, load())
+            except Exception:
+                pass  # keep serving the stale entry; the next read tries again
+            finally:
+                with self._lock:
+                    self._refreshing.discard((namespace, key))
+
+        pool.submit(refresh)
+
+    # Run one datastore_search query through the cache
+    def query(self, namespace, key, resource, params):
+        return self.cached(namespace, key, lambda: self.search(resource, params))
+
+    # Plate-keyed query: exact filter (batched if enabled), full-text only if CKAN rejects the filter
+    def query_plate(self, namespace, resource, plate):
+        limit = self.PLATE_LIMITS[resource]
+
+        def load():
+            records, path = [], "miss"
+            for step, params in plan_plate_query(resource, plate, limit, self.fulltext_fallback):
+                if step == "exact" and self.batching:
+                    records = self.batcher(resource).fetch(plate)
+                    if records is None:
+                        continue
+                else:
+                    data = self.search(resource, params)
+                    if rejected(data):
+                        continue
+                    records = get_records(data)
+                records = plate_records(resource, plate, step, records)
+                if records:
+                    path = step
+                # A query that ran and found nothing is the answer, not a reason to try q
+                break
+            return plate_entry(records, path)
+
+        data = self.cached(namespace, plate, load)
+        with self._lock:
+            self.query_paths[(resource, data.get("path", "q"))] += 1
+        return get_records(data)
+
+    def mirrored(self, resource):
+        return self.mirror is not None and self.mirror.has(resource)
+
+    # 1) Vehicle data (license query)
+    def fetch_vehicle(self, plate):
+        with metrics.stage("vehicle"):
+            if self.mirrored("vehicle"):
+                metrics.note(cache="mirror")
+                return self.mirror.find_plate("vehicle", plate)
+            return self.query_plate("veh", "vehicle", plate)
+
+    # Fallback: personal import vehicles
+    def fetch_personal(self, plate):
+        with metrics.stage("fallback"):
+            if self.mirrored("personal"):
+                metrics.note(cache="mirror")
+                return self.mirror.find_plate("personal", plate, limit=1)
+            return self.query_plate("personal", "personal", plate)
+
+    # 2) Importer price data (using degem_cd and tozeret_cd)
+    def fetch_price(self, degem_cd, tozeret_cd):
+        with metrics.stage("price"):
+            if self.mirrored("price"):
+                metrics.note(cache="mirror")
+                return self.mirror.find_model("price", degem_cd, tozeret_cd)
+            key, params = price_query(degem_cd, tozeret_cd)
+            return get_records(self.query("price", key, "price", params))
+
+    def fetch_details(self, degem_cd, tozeret_cd, shnat_yitzur):
+        with metrics.stage("details"):
+            if self.mirrored("details"):
+                metrics.note(cache="mirror")
+                return self.mirror.find_model("details", degem_cd, tozeret_cd, shnat_yitzur)
+            key, params = details_query(degem_cd, tozeret_cd, shnat_yitzur)
+            return get_records(self.query("details", key, "details", params))
+
+    # 3) Disability tag
+    def fetch_disability(self, plate):
+        with metrics.stage("disability"):
+            if self.mirrored("disability"):
+                metrics.note(cache="mirror")
+                return self.mirror.find_plate("disability", plate, limit=5)
+            return self.query_plate("disability", "disability", plate)
+
+    def find_vehicle(self, plate):
+        personal_fut = None
+        if self.speculative:
+            personal_fut = self.stage_pool().submit(bound(self.fetch_personal), plate)
+            self.count_speculation("started")
+        try:
+            records = self.fetch_vehicle(plate)
+        except Exception:
+            if personal_fut is not None:
+                personal_fut.cancel()
+            raise
+        if records:
+            if personal_fut is not None:
+                if personal_fut.cancel():
+                    self.count_speculation("cancelled")
+                else:
+                    self.count_unneeded(personal_fut)
+            return records[0]  # use the first matching record
+
+        if personal_fut is not None:
+            personal_records = cancel.result(personal_fut)
+            self.count_speculation("used")
+        else:
+            personal_records = self.fetch_personal(plate)
+        if personal_records:
+            # Treat this as vehicle record, marked as personal import type
+            return personal_record(personal_records)
+
+        raise NoDataFound(f"No data found for plate {plate}")
+
+    def count_speculation(self, outcome, n=1):
+        with self._lock:
+            self.speculation[outcome] += n
+
+    # Once an unneeded speculative query ends, count the requests it sent upstream
+    def count_unneeded(self, fut):
+        trace = metrics.current()
+        if trace is not None:
+            fut.add_done_callback(
+                lambda f: self.count_speculation("unneeded_requests", trace.count("fallback", "requests")))
+
+    # Price range, importer and details row of a model, resolved once per model
+    def model_info(self, degem_cd, tozeret_cd, shnat_yitzur):
+        def load():
+            if self.fanout:
+                pool = self.stage_pool()
+                price_fut = pool.submit(bound(self.fetch_price), degem_cd, tozeret_cd)
+                details_fut = pool.submit(bound(self.fetch_details), degem_cd, tozeret_cd, shnat_yitzur)
+                return build_model(cancel.result(price_fut), cancel.result(details_fut))
+            return build_model(self.fetch_price(degem_cd, tozeret_cd),
+                               self.fetch_details(degem_cd, tozeret_cd, shnat_yitzur))
+
+        return self.catalog.get_or_load(model_key(degem_cd, tozeret_cd, shnat_yitzur), load,
+                                        lambda model: model_ttl(model, self.policies, self.default_policy))
+
+    # Pass a metrics.Trace to get this lookup's per-stage timings back
+    def lookup(self, plate, trace=None, token=None):
+        plate = normalize_plate(plate)
+        trace = trace if trace is not None else metrics.Trace()
+        trace.plate = plate
+        try:
+            with metrics.activate(trace), cancel.activate(token):
+                cancel.check()
+                if self.fanout:
+                    return self.lookup_fanout(plate)
+                return self.lookup_serial(plate)
+        finally:
+            trace.finish()
+            self.metrics.record(trace)
+
+    def lookup_serial(self, plate):
+        record = self.find_vehicle(plate)
+        model = self.model_info(*model_of(record))
+        disability_records = self.fetch_disability(plate)
+
+        return build_result(record, model, disability_records)
+
+    # Same pipeline as lookup(), with the independent stages overlapped
+    def lookup_fanout(self, plate):
+        pool = self.stage_pool()
+        disability_fut = pool.submit(bound(self.fetch_disability), plate)
+        try:
+            record = self.find_vehicle(plate)
+        except Exception:
+            disability_fut.cancel()
+            raise
+
+        model = self.model_info(*model_of(record))
+        return build_result(record, model, cancel.result(disability_fut))
+
+
+# Parse the price and details rows of a model once, for every plate of that model
+def build_model(price_records, details_records):
+    importer = None
+    prices = []
+    for rec in price_records:
+        if importer is None:
+            importer = rec.get("shem_yevuan")
+        price = parse_price(rec.get("mehir"))
+        if price is not None:
+            prices.append(price)
+
+    if prices:
+        min_price = min(prices)
+        max_price = max(prices)
+    else:
+        min_price = max_price = 0.0
+
+    details = None
+    if details_records:
+        record_data = details_records[0]  # pick the first record
+        details = {key: record_data.get(key, resources.NOT_REGISTERED) for key in resources.DETAIL_FIELDS}
+
+    return {
+        "min_price": min_price,
+        "max_price": max_price,
+        "has_price_records": bool(price_records),
+        "importer": importer,
+        "details": details,
+    }
+
+
+def build_result(record, model, disability_records):
+    # Parse disability response
+    if disability_records:
+        dis_tag = disability_records[0]   # use first record
+        disability_status = True
+        disability_type = dis_tag.get("SUG TAV", "")
+        disability_issue_date = dis_tag.get("TAARICH HAFAKAT TAG", "")
+    else:
+        disability_status = False
+        disability_type = None
+        disability_issue_date = None
+
+    if model["has_price_records"] and record.get("yevuan_rehev") is None:
+        record["yevuan_rehev"] = model["importer"]
+    if model["details"]:
+        record.update(model["details"])
+
+    return {
+        "record": record,
+        "min_price": model["min_price"],
+        "max_price": model["max_price"],
+        "disability_status": disability_status,
+        "disability_type": disability_type,
+        "disability_issue_date": disability_issue_date,
+        "personal_import": record.get("personal_import", False),
+    }
+
+
+# Positional arguments for DataFetcher.result, in signal order
+def signal_args(result):
+    return (
+        result["record"],
+        result["min_price"],
+        result["max_price"],
+        result["disability_status"],
+        result["disability_type"],
+        result["disability_issue_date"],
+        result["personal_import"],
+    )
+
+
+def lookup_plate(plate, cache_dir="cache", fanout=False, cache_backend="sqlite"):
+    engine = LookupEngine(cache_dir, fanout=fanout, cache_backend=cache_backend)
+    try:
+        return engine.lookup(plate)
+    finally:
+        engine.close()
@@ -0,0 +1,191 @@
+import csv, json, sys
+
+from . import resources
+from .records import RECORD_FIELDS, VehicleRecord
+
+# Output columns, in order: the bulk result status, the lookup summary, then
+# the record columns in LABEL_MAP order followed by the rest of the record
+STATUS_COLUMNS = ["plate", "ok", "error"]
+RESULT_COLUMNS = ["min_price", "max_price", "disability_status", "disability_type", "disability_issue_date",
+                  "personal_import"]
+RECORD_COLUMNS = list(dict.fromkeys(list(resources.LABEL_MAP) + [f for f in RECORD_FIELDS if f != "personal_import"]))
+COLUMNS = STATUS_COLUMNS + RESULT_COLUMNS + RECORD_COLUMNS
+
+# Column types for typed formats (Parquet/Arrow); everything else is a string
+BOOL_COLUMNS = {"ok", "disability_status", "personal_import"}
+FLOAT_COLUMNS = {"min_price", "max_price"}
+INT_COLUMNS = {"shnat_yitzur", "tozeret_cd", "degem_cd"}
+
+# Header labels: LABEL_MAP's Hebrew names where there is one
+LABELS = {**{c: c for c in COLUMNS}, **resources.LABEL_MAP}
+
+
+# One bulk result ({"plate", "ok", "result"/"error"}) as a flat row keyed by COLUMNS
+def flatten(res):
+    row = {"plate": res.get("plate"), "ok": res.get("ok"), "error": res.get("error")}
+    result = res.get("result")
+    if result is None:
+        return row
+    if isinstance(result, VehicleRecord):
+        result = result.to_result()
+    for col in RESULT_COLUMNS:
+        row[col] = result.get(col)
+    record = result.get("record") or {}
+    for col in RECORD_COLUMNS:
+        if col in record:
+            row[col] = record[col]
+    return row
+
+
+def typed(col, value):
+    if value is None or value == "":
+        return None
+    if col in BOOL_COLUMNS:
+        return bool(value)
+    if col in FLOAT_COLUMNS:
+        return float(value)
+    if col in INT_COLUMNS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+class Exporter:
+    """Writes bulk results as they arrive, flushing every ``chunk_size`` rows.
+
+    At most one chunk of rows is held in memory, whatever the number of
+    results. Use as a context manager, or call close() to flush the rest.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self._pending = []
+
+    def write(self, res):
+        self._pending.append(res)
+        self.rows += 1
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.write_chunk(self._pending)
+            self._pending = []
+
+    def write_chunk(self, results):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlExporter(Exporter):
+    def __init__(self, path, chunk_size=1000):
+        super().__init__(chunk_size)
+        self._owns = path != "-"
+        self.f = open(path, "w", encoding="utf-8") if self._owns else sys.stdout
+
+    def write_chunk(self, results):
+        lines = []
+        for res in results:
+            if isinstance(res.get("result"), VehicleRecord):
+                res = dict(res, result=res["result"].to_result())
+            lines.append(json.dumps(res, ensure_ascii=False) + "\n")
+        self.f.write("".join(lines))
+        self.f.flush()
+
+    def close(self):
+        super().close()
+        if self._owns:
+            self.f.close()
+
+
+class CsvExporter(Exporter):
+    # headers="labels" writes LABEL_MAP's Hebrew names instead of column keys
+    def __init__(self, path, chunk_size=1000, headers="keys"):
+        super().__init__(chunk_size)
+        self._owns = path != "-"
+        # utf-8-sig so Excel opens the Hebrew text correctly
+        self.f = open(path, "w", encoding="utf-8-sig", newline="") if self._owns else sys.stdout
+        self.writer = csv.writer(self.f)
+        self.writer.writerow([LABELS[c] for c in COLUMNS] if headers == "labels" else COLUMNS)
+
+    def write_chunk(self, results):
+        rows = []
+        for res in results:
+            row = flatten(res)
+            rows.append(["" if row.get(c) is None else row[c] for c in COLUMNS])
+        self.writer.writerows(rows)
+        self.f.flush()
+
+    def close(self):
+        super().close()
+        if self._owns:
+            self.f.close()
+
+
+def arrow_schema():
+    import pyarrow as pa
+    types = {**{c: pa.string() for c in COLUMNS}, **{c: pa.bool_() for c in BOOL_COLUMNS},
+             **{c: pa.float64() for c in FLOAT_COLUMNS}, **{c: pa.int64() for c in INT_COLUMNS}}
+    return pa.schema([(c, types[c]) for c in COLUMNS])
+
+
+class ArrowExporter(Exporter):
+    """Parquet (one row group per chunk) or Arrow IPC file output; needs pyarrow."""
+
+    def __init__(self, path, chunk_size=10000, fmt="parquet"):
+        super().__init__(chunk_size)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(f"{fmt} export needs pyarrow (pip install pyarrow)") from None
+        self.pa = pa
+        self.schema = arrow_schema()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write_chunk(self, results):
+        columns = {c: [] for c in COLUMNS}
+        for res in results:
+            row = flatten(res)
+            for c in COLUMNS:
+                columns[c].append(typed(c, row.get(c)))
+        batch = self.pa.record_batch([self.pa.array(columns[c], type=self.schema.field(c).type) for c in COLUMNS],
+                                     schema=self.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet",
+           ".arrow": "arrow", ".feather": "arrow"}
+
+
+# Exporter for ``path`` ("-" is stdout); the format comes from the extension unless given
+def open_exporter(path, fmt=None, chunk_size=None, headers="keys"):
+    if fmt is None:
+        fmt = next((f for ext, f in FORMATS.items() if path.lower().endswith(ext)), "jsonl")
+    if fmt == "jsonl":
+        return JsonlExporter(path, chunk_size or 1000)
+    if fmt == "csv":
+        return CsvExporter(path, chunk_size or 1000, headers)
+    if fmt in ("parquet", "arrow"):
+        if path == "-":
+            raise ValueError(f"{fmt} output needs a file path")
+        return ArrowExporter(path, chunk_size or 10000, fmt)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,257 @@
+import random, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from . import cancel, metrics, resources
+from .scheduler import BATCH, Scheduler
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Exponential backoff with full jitter, honouring Retry-After when the server sends one
+def retry_delay(attempt, backoff, backoff_max, retry_after=None):
+    delay = random.uniform(0, min(backoff_max, backoff * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(backoff_max, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+class LatencyWindow:
+    """Recent request latencies, for percentile thresholds."""
+
+    def __init__(self, size=500, min_samples=20):
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    # None until there are enough samples to trust
+    def percentile(self, pct):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            data = sorted(self.samples)
+        return data[min(len(data) - 1, int(len(data) * pct / 100))]
+
+
+class CkanClient:
+    """Pooled keep-alive client for CKAN ``datastore_search`` calls.
+
+    A single instance is safe to share between threads; every lookup reuses
+    the same pool of TCP/TLS connections to data.gov.il. ``pool_size`` caps
+    the number of kept-alive connections and should be at least the number
+    of threads issuing requests concurrently.
+
+    Every attempt, retries included, goes through ``scheduler`` (rate limit,
+    adaptive concurrency and priority order); calls made without an explicit
+    priority run at ``priority``.
+
+    With ``hedge_percentile`` set (e.g. 95), a call still unanswered after
+    that percentile of recent latencies gets a duplicate request, and
+    whichever answers first wins. ``hedged`` and ``hedge_wins`` count the
+    extra requests and how often they paid off.
+
+    Calls made under an active cancel.CancelToken stop waiting for their
+    slot, backoff or response as soon as it is cancelled; a request already
+    on the wire is abandoned and its late response dropped.
+    """
+
+    def __init__(self, base_url=resources.BASE_URL, pool_size=10, connect_timeout=5.0,
+                 read_timeout=30.0, retries=3, backoff=0.5, backoff_max=10.0, scheduler=None, priority=BATCH,
+                 hedge_percentile=None):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.scheduler = scheduler or Scheduler()
+        self.priority = priority
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyWindow()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._hedge_pool = None
+        self._request_pool = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    # Created on first request, so importing and configuring the client never loads requests
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._session = requests.Session()
+                # Retries are handled in call() so they get jittered backoff
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+            return self._session
+
+    def _sleep(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        cancel.sleep(retry_delay(attempt, self.backoff, self.backoff_max, retry_after))
+
+    def search(self, params, priority=None):
+        return self.action("datastore_search", params, priority)
+
+    # Call any CKAN action (e.g. resource_show) on the same API as base_url
+    def action(self, name, params, priority=None):
+        url = self.base_url.rsplit("/", 1)[0] + "/" + name
+        priority = self.priority if priority is None else priority
+        delay = self.latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if delay is None:
+            return self.call(url, params, priority)
+
+        pool = self.hedge_pool()
+        call = cancel.bind(metrics.bind(self.call))
+        primary = pool.submit(call, url, params, priority)
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+
+        hedge = pool.submit(call, url, params, priority)
+        with self._lock:
+            self.hedged += 1
+        # The slower copy is left to finish on its own; its answer is dropped
+        for fut in as_completed((primary, hedge)):
+            if fut.exception() is None:
+                if fut is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return fut.result()
+        return primary.result()
+
+    def hedge_pool(self):
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_size * 2, thread_name_prefix="ckan-hedge")
+            return self._hedge_pool
+
+    # Requests made under a cancel token run here, so the caller can stop waiting for them
+    def request_pool(self):
+        with self._lock:
+            if self._request_pool is None:
+                self._request_pool = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="ckan-request")
+            return self._request_pool
+
+    def get(self, url, params, started):
+        token = cancel.current()
+        if token is None:
+            return self.session().get(url, params=params, timeout=self.timeout)
+        fut = self.request_pool().submit(self.session().get, url, params=params, timeout=self.timeout)
+        try:
+            return cancel.result(fut)
+        except cancel.Cancelled:
+            # The slot stays taken until the abandoned request actually ends
+            fut.add_done_callback(lambda f: self.scheduler.release(
+                started, None if f.exception() is not None else f.result().status_code))
+            raise
+
+    # One request with retries
+    def call(self, url, params, priority):
+        import requests
+        attempt = 0
+        while True:
+            started = self.scheduler.acquire(priority, cancel.current())
+            response = error = None
+            release = True
+            try:
+                response = self.get(url, params, started)
+            except cancel.Cancelled:
+                release = False  # get() gives the slot back once the abandoned request ends
+                raise
+            except requests.RequestException as e:
+                # Connection errors and timeouts, but also truncated or undecodable bodies
+                error = e
+            finally:
+                # Every other way out, including unexpected errors, frees the slot here
+                if release:
+                    self.scheduler.release(started, None if response is None else response.status_code)
+            if error is not None:
+                metrics.note(requests=1)
+                if attempt >= self.retries:
+                    raise error
+                metrics.note(retries=1)
+                self._sleep(attempt)
+                attempt += 1
+                continue
+            self.latency.add(time.monotonic() - started)
+            metrics.note(requests=1, bytes=len(response.content))
+
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                metrics.note(retries=1)
+                self._sleep(attempt, response)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+                response.raise_for_status()
+            # CKAN reports bad queries as 4xx with a JSON error body, which reads as no records
+            parse_started = time.perf_counter()
+            data = response.json()
+            metrics.note(parse_seconds=time.perf_counter() - parse_started)
+            return data
+
+    # View of this client (same pool and scheduler) whose calls default to another priority
+    def with_priority(self, priority):
+        return PriorityClient(self, priority)
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        if self._request_pool is not None:
+            self._request_pool.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
+
+
+class PriorityClient:
+    def __init__(self, client, priority):
+        self.client = client
+        self.priority = priority
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def search(self, params, priority=None):
+        return self.client.search(params, self.priority if priority is None else priority)
+
+    def action(self, name, params, priority=None):
+        return self.client.action(name, params, self.priority if priority is None else priority)
+
+    def with_priority(self, priority):
+        return PriorityClient(self.client, priority)
+
+    def close(self):
+        pass  # the pool belongs to the underlying client
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+# Process-wide client shared by every LookupEngine that isn't given its own
+def get_client():
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = CkanClient()
+        return _default_client
+
+
+# Replace the shared client, e.g. to size the pool for a bulk run
+def configure(**kwargs):
+    global _default_client
+    with _default_lock:
+        old, _default_client = _default_client, CkanClient(**kwargs)
+    if old is not None:
+        old.close()
+    return _default_client
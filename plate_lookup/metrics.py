@@ -0,0 +1,234 @@
+import bisect, contextvars, json, threading, time
+from collections import Counter
+from contextlib import contextmanager
+
+# Histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (trace, stage) of the running lookup; a context variable, so it follows
+# threads and asyncio tasks alike
+_current = contextvars.ContextVar("plate_lookup_trace", default=None)
+
+
+def new_stage():
+    return {"seconds": 0.0, "bytes": 0, "requests": 0, "retries": 0, "parse_seconds": 0.0, "cache": None}
+
+
+class Trace:
+    """Timings of one lookup, per pipeline stage.
+
+    Each stage (vehicle, fallback, price, details, disability, render...)
+    records wall time, bytes received, requests and retries made, time
+    spent parsing JSON, and whether the cache answered (hit, stale, miss,
+    or mirror).
+    """
+
+    def __init__(self, plate=None):
+        self.plate = plate
+        self.started = time.time()
+        self.seconds = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        with self._lock:
+            self.stages.setdefault(name, new_stage())
+        previous = _current.get()
+        _current.set((self, name))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.set(previous)
+            with self._lock:
+                self.stages[name]["seconds"] += elapsed
+
+    def add(self, name, **counts):
+        with self._lock:
+            stage = self.stages.setdefault(name, new_stage())
+            for key, value in counts.items():
+                if key == "cache":
+                    stage["cache"] = value
+                else:
+                    stage[key] += value
+
+    # One counter of a stage, e.g. count("fallback", "requests")
+    def count(self, name, key):
+        with self._lock:
+            return self.stages.get(name, {}).get(key, 0)
+
+    # How the cache answered a stage (hit, stale, miss, mirror), or None
+    def cache_state(self, name):
+        with self._lock:
+            return self.stages.get(name, {}).get("cache")
+
+    def finish(self):
+        self.seconds = time.time() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: dict(st, seconds=round(st["seconds"], 4), parse_seconds=round(st["parse_seconds"], 4))
+                      for name, st in self.stages.items()}
+        return {"plate": self.plate, "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+                "stages": stages}
+
+    # e.g. "vehicle 120ms (hit) · price 340ms · disability 95ms"
+    def summary(self):
+        parts = []
+        for name, st in self.to_dict()["stages"].items():
+            text = f"{name} {st['seconds'] * 1000:.0f}ms"
+            if st["cache"]:
+                text += f" ({st['cache']})"
+            parts.append(text)
+        return " · ".join(parts)
+
+
+# Make ``trace`` the active one; None runs the block untraced
+@contextmanager
+def activate(trace):
+    previous = _current.get()
+    _current.set((trace, None) if trace is not None else None)
+    try:
+        yield trace
+    finally:
+        _current.set(previous)
+
+
+# The trace of the lookup running on this thread or task, or None
+def current():
+    current = _current.get()
+    return current[0] if current is not None else None
+
+
+# Time a stage of the trace active on this thread; does nothing outside a traced lookup
+@contextmanager
+def stage(name):
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    with current[0].stage(name):
+        yield
+
+
+# Add counts (bytes=, requests=, retries=, parse_seconds=, cache=) to the active stage
+def note(**counts):
+    current = _current.get()
+    if current is not None and current[1] is not None:
+        current[0].add(current[1], **counts)
+
+
+# Wrap fn so that, run on another thread, it reports into this thread's trace and stage
+def bind(fn):
+    current = _current.get()
+    if current is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        previous = _current.get()
+        _current.set(current)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.set(previous)
+
+    return bound
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running, out = 0, []
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            out.append((bound, running))
+        return out
+
+
+class Metrics:
+    """Aggregate stage histograms and counters over many lookups."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.seconds = {}
+        self.totals = {}
+        self.cache = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **counts):
+        with self._lock:
+            self.seconds.setdefault(name, Histogram()).observe(seconds)
+            totals = self.totals.setdefault(name, Counter())
+            for key in ("bytes", "requests", "retries", "parse_seconds"):
+                totals[key] += counts.get(key, 0)
+            if counts.get("cache"):
+                self.cache[(name, counts["cache"])] += 1
+
+    def record(self, trace):
+        for name, st in trace.to_dict()["stages"].items():
+            self.observe(name, st["seconds"], **{k: v for k, v in st.items() if k != "seconds"})
+        with self._lock:
+            self.lookups += 1
+            if trace.seconds is not None:
+                self.seconds.setdefault("lookup", Histogram()).observe(trace.seconds)
+
+    def to_dict(self):
+        with self._lock:
+            stages = {}
+            for name, hist in self.seconds.items():
+                totals = self.totals.get(name, Counter())
+                stages[name] = {
+                    "count": hist.count,
+                    "seconds_sum": round(hist.total, 4),
+                    "buckets": {str(bound): n for bound, n in hist.cumulative()},
+                    "bytes": totals["bytes"],
+                    "requests": totals["requests"],
+                    "retries": totals["retries"],
+                    "parse_seconds": round(totals["parse_seconds"], 4),
+                    "cache": {state: n for (stage_name, state), n in self.cache.items() if stage_name == name},
+                }
+            return {"lookups": self.lookups, "stages": stages}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    # Prometheus text exposition format
+    def to_prometheus(self):
+        data = self.to_dict()
+        lines = ["# TYPE plate_lookup_lookups_total counter", f"plate_lookup_lookups_total {data['lookups']}",
+                 "# TYPE plate_lookup_stage_seconds histogram"]
+        for name, st in data["stages"].items():
+            for bound, n in st["buckets"].items():
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f'plate_lookup_stage_seconds_bucket{{stage="{name}",le="{le}"}} {n}')
+            lines.append(f'plate_lookup_stage_seconds_sum{{stage="{name}"}} {st["seconds_sum"]}')
+            lines.append(f'plate_lookup_stage_seconds_count{{stage="{name}"}} {st["count"]}')
+        for key in ("bytes", "requests", "retries"):
+            lines.append(f"# TYPE plate_lookup_stage_{key}_total counter")
+            for name, st in data["stages"].items():
+                lines.append(f'plate_lookup_stage_{key}_total{{stage="{name}"}} {st[key]}')
+        lines.append("# TYPE plate_lookup_cache_total counter")
+        for name, st in data["stages"].items():
+            for state, n in st["cache"].items():
+                lines.append(f'plate_lookup_cache_total{{stage="{name}",state="{state}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json())
+
+
+# Process-wide registry every engine reports to unless given its own
+REGISTRY = Metrics()
@@ -0,0 +1,275 @@
+import argparse, csv, os, sys, time
+
+from . import resources
+from .cache import LocalConnections, decode, encode
+from .http_client import get_client
+from .scheduler import BACKGROUND
+
+
+# Key columns are stored as text so API ints and CSV strings compare equal
+def norm_key(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.endswith(".0") and value[:-2].isdigit():
+        value = value[:-2]
+    return value or None
+
+
+# A record as comparable data: every value normalized like a key column, so
+# the same row loaded from a CSV dump (strings) and from the API (numbers)
+# compares equal. Empty values and CKAN's search-only columns are dropped.
+def norm_row(rec):
+    return {k: v for k, v in ((k, norm_key(v)) for k, v in rec.items() if k not in ("_full_text", "rank"))
+            if v is not None}
+
+
+class MirrorStore:
+    """Local SQLite copy of the data.gov.il vehicle resources.
+
+    Rows of every resource live in one table, indexed by plate for the
+    vehicle/personal/disability resources and by (degem_cd, tozeret_cd,
+    shnat_yitzur) for the price and details resources, so a lookup is a
+    single index probe instead of an HTTP round trip. Resources are loaded
+    by paging through CKAN (load_ckan) or from a CSV dump (load_csv).
+    """
+
+    def __init__(self, path=os.path.join("cache", "mirror.db")):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conns = LocalConnections(path)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " resource TEXT NOT NULL, _id INTEGER NOT NULL, plate TEXT,"
+                " degem_cd TEXT, tozeret_cd TEXT, shnat_yitzur TEXT, data BLOB NOT NULL,"
+                " PRIMARY KEY (resource, _id)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS rows_plate ON rows (resource, plate)")
+            conn.execute("CREATE INDEX IF NOT EXISTS rows_model ON rows (resource, degem_cd, tozeret_cd, shnat_yitzur)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS loaded ("
+                " resource TEXT PRIMARY KEY, row_count INTEGER NOT NULL, source TEXT, updated REAL NOT NULL)"
+            )
+            # Delta sync progress: highest upstream _id applied and rows held locally
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " resource TEXT PRIMARY KEY, high_water INTEGER NOT NULL, row_count INTEGER NOT NULL,"
+                " last_modified TEXT, updated REAL NOT NULL)"
+            )
+            # How far an explicit revalidation pass has compared the held rows
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revalidate_state ("
+                " resource TEXT PRIMARY KEY, next_offset INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        return self._conns.get()
+
+    def has(self, resource):
+        return self._conn().execute("SELECT 1 FROM loaded WHERE resource = ?", (resource,)).fetchone() is not None
+
+    def _row(self, resource, rec, _id):
+        plate_col = resources.PLATE_COLUMNS.get(resource)
+        return (
+            resource,
+            int(rec.get("_id") or _id),
+            norm_key(rec.get(plate_col)) if plate_col else None,
+            norm_key(rec.get("degem_cd")),
+            norm_key(rec.get("tozeret_cd")),
+            norm_key(rec.get("shnat_yitzur")),
+            encode(rec),
+        )
+
+    # Insert or replace a batch of records inside one transaction. With a
+    # sync ``state`` (high_water, row_count, last_modified) the sync progress
+    # is committed in the same transaction, so an interrupted sync resumes
+    # exactly after the last applied batch.
+    def put_many(self, resource, records, start_id=0, state=None):
+        rows = [self._row(resource, rec, start_id + i) for i, rec in enumerate(records)]
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if state is not None:
+                self._write_sync_state(conn, resource, state)
+        return len(rows)
+
+    def _write_sync_state(self, conn, resource, state):
+        conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                     (resource,) + tuple(state) + (time.time(),))
+
+    def set_sync_state(self, resource, state):
+        conn = self._conn()
+        with conn:
+            self._write_sync_state(conn, resource, state)
+
+    def sync_state(self, resource):
+        row = self._conn().execute(
+            "SELECT high_water, row_count, last_modified FROM sync_state WHERE resource = ?", (resource,)
+        ).fetchone()
+        if row is None and self.has(resource):
+            # Resource was fully loaded before; derive the state from the rows
+            row = self._conn().execute(
+                "SELECT COALESCE(MAX(_id), 0), COUNT(*), NULL FROM rows WHERE resource = ?", (resource,)
+            ).fetchone()
+        return row
+
+    # Offset the unfinished revalidation pass of a resource stopped at (0 if none)
+    def revalidate_offset(self, resource):
+        row = self._conn().execute("SELECT next_offset FROM revalidate_state WHERE resource = ?", (resource,)).fetchone()
+        return row[0] if row else 0
+
+    # Record revalidation progress; None once the pass is complete
+    def set_revalidate_offset(self, resource, offset):
+        conn = self._conn()
+        with conn:
+            if offset is None:
+                conn.execute("DELETE FROM revalidate_state WHERE resource = ?", (resource,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO revalidate_state VALUES (?, ?, ?)", (resource, offset, time.time()))
+
+    def get_row(self, resource, _id):
+        row = self._conn().execute("SELECT data FROM rows WHERE resource = ? AND _id = ?", (resource, _id)).fetchone()
+        return decode(row[0]) if row else None
+
+    # Stored rows with first_id <= _id <= last_id, in _id order
+    def get_rows(self, resource, first_id, last_id):
+        rows = self._conn().execute(
+            "SELECT data FROM rows WHERE resource = ? AND _id BETWEEN ? AND ? ORDER BY _id",
+            (resource, first_id, last_id),
+        ).fetchall()
+        return [decode(r[0]) for r in rows]
+
+    def mark_loaded(self, resource, source):
+        conn = self._conn()
+        count = conn.execute("SELECT COUNT(*) FROM rows WHERE resource = ?", (resource,)).fetchone()[0]
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO loaded VALUES (?, ?, ?, ?)", (resource, count, source, time.time()))
+        return count
+
+    def clear(self, resource):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rows WHERE resource = ?", (resource,))
+            conn.execute("DELETE FROM loaded WHERE resource = ?", (resource,))
+            conn.execute("DELETE FROM sync_state WHERE resource = ?", (resource,))
+            conn.execute("DELETE FROM revalidate_state WHERE resource = ?", (resource,))
+
+    # Page through a CKAN resource once and store every row
+    def load_ckan(self, resource, client, page_size=10000, progress=None):
+        self.clear(resource)
+        offset = 0
+        while True:
+            params = {"resource_id": resources.RESOURCES[resource], "limit": page_size,
+                      "offset": offset, "sort": "_id asc"}
+            records = client.search(params).get("result", {}).get("records", [])
+            if not records:
+                break
+            high_water = max(int(r.get("_id") or 0) for r in records)
+            self.put_many(resource, records, offset, state=(high_water, offset + len(records), None))
+            offset += len(records)
+            if progress:
+                progress(resource, offset)
+            if len(records) < page_size:
+                break
+        return self.mark_loaded(resource, "ckan")
+
+    # Ingest a CSV dump of a resource (as exported from data.gov.il)
+    def load_csv(self, resource, path, batch_size=10000, progress=None, delimiter=None):
+        self.clear(resource)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            if delimiter is None:
+                delimiter = csv.Sniffer().sniff(f.readline(), delimiters=",|;\t").delimiter
+                f.seek(0)
+            reader = csv.DictReader(f, delimiter=delimiter)
+            batch, total = [], 0
+            for rec in reader:
+                batch.append(rec)
+                if len(batch) >= batch_size:
+                    total += self.put_many(resource, batch, total)
+                    batch = []
+                    if progress:
+                        progress(resource, total)
+            if batch:
+                total += self.put_many(resource, batch, total)
+        return self.mark_loaded(resource, os.path.abspath(path))
+
+    def find_plate(self, resource, plate, limit=10):
+        rows = self._conn().execute(
+            "SELECT data FROM rows WHERE resource = ? AND plate = ? ORDER BY _id LIMIT ?",
+            (resource, norm_key(plate), limit),
+        ).fetchall()
+        return [decode(r[0]) for r in rows]
+
+    def find_model(self, resource, degem_cd, tozeret_cd, shnat_yitzur=None, limit=100):
+        sql = "SELECT data FROM rows WHERE resource = ? AND degem_cd = ? AND tozeret_cd = ?"
+        args = [resource, norm_key(degem_cd), norm_key(tozeret_cd)]
+        if shnat_yitzur is not None:
+            sql += " AND shnat_yitzur = ?"
+            args.append(norm_key(shnat_yitzur))
+        rows = self._conn().execute(sql + " ORDER BY _id LIMIT ?", args + [limit]).fetchall()
+        return [decode(r[0]) for r in rows]
+
+    # Every row of a resource as (degem_cd, tozeret_cd, shnat_yitzur, record), read in batches
+    def scan(self, resource, batch_size=10000):
+        cursor = self._conn().execute(
+            "SELECT degem_cd, tozeret_cd, shnat_yitzur, data FROM rows WHERE resource = ?", (resource,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for degem_cd, tozeret_cd, shnat_yitzur, data in rows:
+                yield degem_cd, tozeret_cd, shnat_yitzur, decode(data)
+
+    def stats(self):
+        return {r[0]: {"rows": r[1], "source": r[2], "updated": r[3]}
+                for r in self._conn().execute("SELECT resource, row_count, source, updated FROM loaded")}
+
+    def close(self):
+        self._conns.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plate_lookup.mirror", description="Build the local offline dataset mirror.")
+    parser.add_argument("--db", default=os.path.join("cache", "mirror.db"), help="mirror database (default: cache/mirror.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="load resources from data.gov.il, or from a CSV dump with --csv")
+    load.add_argument("resources", nargs="*", default=list(resources.RESOURCES), help="resource names (default: all)")
+    load.add_argument("--csv", help="CSV dump to ingest instead of paging CKAN (single resource)")
+    load.add_argument("--page-size", type=int, default=10000)
+    sub.add_parser("stats", help="show loaded resources")
+    args = parser.parse_args(argv)
+
+    store = MirrorStore(args.db)
+    if args.command == "stats":
+        for name, info in store.stats().items():
+            print(f"{name}: {info['rows']} rows from {info['source']} ({time.ctime(info['updated'])})")
+        return 0
+
+    unknown = [r for r in args.resources if r not in resources.RESOURCES]
+    if unknown:
+        parser.error(f"unknown resource(s): {', '.join(unknown)}")
+    if args.csv and len(args.resources) != 1:
+        parser.error("--csv needs exactly one resource name")
+
+    def progress(name, rows):
+        print(f"\r{name}: {rows} rows", end="", file=sys.stderr, flush=True)
+
+    for name in args.resources:
+        started = time.time()
+        if args.csv:
+            count = store.load_csv(name, args.csv, progress=progress)
+        else:
+            count = store.load_ckan(name, get_client().with_priority(BACKGROUND), page_size=args.page_size, progress=progress)
+        print(f"\r{name}: {count} rows in {time.time() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
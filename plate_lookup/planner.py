@@ -0,0 +1,52 @@
+import json
+
+from . import resources
+from .mirror import norm_key
+
+# Israeli plates are 5-8 digits (7 and 8 for current plates)
+MIN_PLATE_DIGITS = 5
+MAX_PLATE_DIGITS = 8
+
+
+class InvalidPlate(ValueError):
+    pass
+
+
+# "12-345-67", " 1234567 " and "12 345 67" all become "1234567"
+def normalize_plate(plate):
+    text = str(plate).strip()
+    for ch in "- .":
+        text = text.replace(ch, "")
+    if not text.isdigit() or not (MIN_PLATE_DIGITS <= len(text) <= MAX_PLATE_DIGITS):
+        raise InvalidPlate(f"Invalid license plate: {plate}")
+    return text
+
+
+# Plate value as CKAN expects it in filters (the key columns are numeric)
+def filter_value(plate):
+    plate = norm_key(plate)
+    return int(plate) if plate and plate.isdigit() else plate
+
+
+def plan_plate_query(resource, plate, limit, fallback=True):
+    """Query plan for a plate-keyed resource, as (path, params) steps.
+
+    The exact ``filters`` lookup on the resource's key column comes first.
+    The full-text ``q`` search is only for when CKAN rejects that query
+    (e.g. the key column was renamed or changed type) and ``fallback`` is
+    on; an exact query that runs and finds no rows is a real miss.
+    """
+    resource_id = resources.RESOURCES[resource]
+    exact = {"resource_id": resource_id, "limit": limit,
+             "filters": json.dumps({resources.PLATE_COLUMNS[resource]: [filter_value(plate)]})}
+    fulltext = {"resource_id": resource_id, "q": str(plate), "limit": limit}
+    return [("exact", exact), ("q", fulltext)] if fallback else [("exact", exact)]
+
+
+# Drop full-text hits where the plate only appears in some other column
+def match_plate(resource, plate, records):
+    column = resources.PLATE_COLUMNS[resource]
+    if not any(column in rec for rec in records):
+        # Key column isn't in the rows at all; keep the old take-what-q-found behaviour
+        return records
+    return [rec for rec in records if norm_key(rec.get(column)) == norm_key(plate)]
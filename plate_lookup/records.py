@@ -0,0 +1,158 @@
+import sys
+from operator import attrgetter
+
+from . import resources
+
+
+class Missing:
+    """Shared stand-in for the "not registered" default of detail fields."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+    # Unpickles as the same singleton (records cross process pools)
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = Missing()
+
+# Vehicle columns, importer and model details, in dict order
+RECORD_FIELDS = tuple(dict.fromkeys(
+    resources.FIELDS["vehicle"] + ["yevuan_rehev"] + resources.DETAIL_FIELDS + ["personal_import"]
+))
+# The rest of a lookup result besides the record
+RESULT_FIELDS = ("min_price", "max_price", "disability_status", "disability_type", "disability_issue_date")
+# Per-vehicle values; not worth interning
+UNIQUE_FIELDS = {"mispar_rechev", "misgeret"}
+
+_UNSET = object()
+
+
+def compact_value(field, value):
+    if value == resources.NOT_REGISTERED:
+        return MISSING
+    if isinstance(value, str) and field not in UNIQUE_FIELDS:
+        return sys.intern(value)
+    return value
+
+
+class VehicleRecord:
+    """Slotted form of a lookup result, for holding many of them at once.
+
+    Each known column is a slot; strings of repeating columns (make, model,
+    colour, fuel...) are interned so every record shares one copy, and the
+    "לא רשום" default is the MISSING singleton. Columns the record didn't
+    have stay unset and cost nothing; unknown columns (e.g. unprojected
+    personal-import rows) go to ``extra``.
+
+    ``from_result()``/``to_result()`` and ``from_dict()``/``to_dict()``
+    convert to and from the lookup() result and record dict shapes.
+    """
+
+    __slots__ = RECORD_FIELDS + RESULT_FIELDS + ("extra",)
+
+    def __init__(self, **fields):
+        extra = None
+        for name, value in fields.items():
+            if name in _SLOTS:
+                setattr(self, name, compact_value(name, value))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[sys.intern(name)] = compact_value(name, value)
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(**record)
+
+    @classmethod
+    def from_result(cls, result):
+        rec = cls(**result["record"])
+        rec.min_price = result["min_price"]
+        rec.max_price = result["max_price"]
+        rec.disability_status = result["disability_status"]
+        rec.disability_type = compact_value("disability_type", result["disability_type"])
+        rec.disability_issue_date = compact_value("disability_issue_date", result["disability_issue_date"])
+        return rec
+
+    # Dict-style read; MISSING reads as the original "לא רשום" string
+    def get(self, name, default=None):
+        if name in _SLOTS:
+            value = getattr(self, name, _UNSET)
+        else:
+            value = self.extra.get(name, _UNSET) if self.extra else _UNSET
+        if value is _UNSET:
+            return default
+        return resources.NOT_REGISTERED if value is MISSING else value
+
+    def to_dict(self):
+        out = {}
+        for name in RECORD_FIELDS:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                out[name] = resources.NOT_REGISTERED if value is MISSING else value
+        if self.extra:
+            for name, value in self.extra.items():
+                out[name] = resources.NOT_REGISTERED if value is MISSING else value
+        return out
+
+    def to_result(self):
+        return {
+            "record": self.to_dict(),
+            "min_price": getattr(self, "min_price", 0.0),
+            "max_price": getattr(self, "max_price", 0.0),
+            "disability_status": getattr(self, "disability_status", False),
+            "disability_type": self.get("disability_type"),
+            "disability_issue_date": self.get("disability_issue_date"),
+            "personal_import": getattr(self, "personal_import", False),
+        }
+
+    def __repr__(self):
+        return f"VehicleRecord(mispar_rechev={self.get('mispar_rechev')!r}, degem_nm={self.get('degem_nm')!r})"
+
+
+_SLOTS = frozenset(VehicleRecord.__slots__) - {"extra"}
+
+
+# Sort key that puts missing values last instead of failing on mixed types
+def _sort_key(field):
+    def key(rec):
+        value = getattr(rec, field, MISSING) if field in _SLOTS else rec.get(field, MISSING)
+        if value is MISSING or value is None:
+            return (2, "")
+        if isinstance(value, (int, float)):
+            return (0, value)
+        return (1, str(value))
+    return key
+
+
+def sort_records(records, field, reverse=False):
+    if field in _SLOTS:
+        try:
+            # Plain slot reads when every record has a comparable value
+            return sorted(records, key=attrgetter(field), reverse=reverse)
+        except (AttributeError, TypeError):
+            pass
+    return sorted(records, key=_sort_key(field), reverse=reverse)
+
+
+def _reader(name):
+    if name in _SLOTS:
+        return lambda rec: getattr(rec, name, MISSING)
+    return lambda rec: (rec.extra or {}).get(name, MISSING)
+
+
+# Records whose fields equal the given values, e.g. filter_records(recs, tozeret_nm="טויוטה יפן")
+def filter_records(records, **criteria):
+    # One narrowing pass per criterion
+    for name, value in criteria.items():
+        read, value = _reader(name), compact_value(name, value)
+        records = [rec for rec in records if read(rec) == value]
+    return records if criteria else list(records)
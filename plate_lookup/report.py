@@ -0,0 +1,421 @@
+import argparse, json, os, re, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html import escape
+from itertools import islice
+from string import Template
+
+from .resources import LABEL_MAP
+
+ICONS_CSS = "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css"
+
+# Shared report stylesheet: written once as report.css next to batch reports,
+# or inlined once at the top of a single-file report
+REPORT_CSS = """@media print {
+    .page { page-break-after: always; }
+}
+body {
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial;
+    margin: 20px;
+    direction: rtl;
+    background: #f5f6fa;
+    color: #111;
+}
+.container {
+    max-width: 900px;
+    margin: auto;
+    padding: 20px;
+}
+header {
+    text-align: center;
+    margin-bottom: 20px;
+}
+header h1 {
+    font-size: 24px;
+    letter-spacing: 0.5px;
+    background: linear-gradient(90deg,#2bb7ff,#0066cc);
+    -webkit-background-clip: text;
+    color: transparent;
+}
+header .meta {
+    font-size: 13px;
+    color: #666;
+    margin-top: 4px;
+}
+
+.section {
+    background: #fff;
+    border-radius: 10px;
+    padding: 18px;
+    margin-bottom: 18px;
+    box-shadow: 0 2px 6px rgba(0,0,0,0.05);
+}
+
+.section h2 {
+    font-size: 16px;
+    margin-bottom: 12px;
+    color: #0066cc;
+    display: flex;
+    align-items: center;
+    gap: 6px;
+}
+.section h2 i { font-size: 18px; }
+
+.grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 12px 20px;
+}
+.grid-item {
+    display: flex;
+    justify-content: space-between;
+    padding: 8px 0;
+    border-bottom: 1px dashed #eaecef;
+}
+.grid-item:last-child { border-bottom: none; }
+.label {
+    font-weight: 600;
+    color: #333;
+}
+.value {
+    direction: ltr;
+    text-align: left;
+    color: #111;
+}
+.price-block {
+    margin-top: 16px;
+    display: flex;
+    gap: 12px;
+    align-items: center;
+}
+.price-text { font-weight: 700; color: #0b5ed7; }
+.price-bar {
+    flex: 1;
+    height: 18px;
+    background: #eee;
+    border-radius: 10px;
+    overflow: hidden;
+    position: relative;
+}
+.price-fill {
+    height: 100%;
+    background: linear-gradient(90deg,#2bb7ff,#0066cc);
+    width: 0%;
+    transition: width 400ms ease;
+}
+.footer {
+    margin-top: 24px;
+    font-size: 12px;
+    color: #777;
+    text-align: center;
+}
+a { color: #0b5ed7; }
+"""
+
+YES = "<i class='bi bi-check-circle-fill' style='color:green'></i>"
+NO = "<i class='bi bi-x-circle-fill' style='color:red'></i>"
+
+# Fields shown first, and the structured fields after the disability/import rows
+GENERAL_FIELDS = ["mispar_rechev", "tozeret_nm", "degem_manoa", "degem_nm", "shnat_yitzur", "tzeva_rechev", "sug_delek_nm"]
+OTHER_FIELDS = ["merkav", "nefach_manoa", "koah_sus", "mispar_dlatot", "mispar_moshavim", "baalut",
+                "tokef_dt", "mivchan_acharon_dt", "kvuzat_agra_cd", "kariot_avir_source"]
+
+# Templates are parsed once at import; every report only substitutes into them
+ROW = Template("<div class='grid-item'><span class='label'>$label</span><span class='value'>$value</span></div>")
+
+PRICE_BAR = Template("""
+    <div class="price-block">
+        <div class="price-text">$price_text</div>
+        <div class="price-text">יובא על ידי: $importer</div>
+        <div class="price-bar" aria-hidden="true">
+        <div class="price-fill" style="width:$pct%"></div>
+        </div>
+        <div style="min-width:120px;text-align:left;font-size:13px;color:#333;">
+        <div>נמוך: ₪$low</div>
+        <div>גבוה: ₪$high</div>
+        </div>
+    </div>
+""")
+
+PRICE_ONLY = Template("<div class='price-block'><div class='price-text'>$price_text</div></div>")
+
+PAGE = Template("""<div class="container page">
+    <header>
+        <h1>דו"ח איתור וניתוח רכב</h1>
+        <div class="meta">נוצר: $generated — מקור: data.gov.il</div>
+    </header>
+
+    <div class="intro">
+        מסמך זה מציג את תוצאות החיפוש, המיון והעיבוד עבור מספר רכב מבוקש. המידע נלקח ממאגרי מידע ציבוריים ומשקף את מצב הרכב כפי שנרשם.
+    </div>
+
+    <div class='section'>
+        <h2><i class='bi bi-info-circle'></i> פרטים כלליים</h2>
+        <div class='grid'>$general</div>
+    </div>
+    <div class='section'>
+        <h2><i class='bi bi-card-list'></i> רישוי ובעלות</h2>
+        <div class='grid'>$licensing</div>
+    </div>
+    <div class='section'>
+        <h2><i class='bi bi-gear'></i> מפרט טכני</h2>
+        <div class='grid'>$technical</div>
+    </div>
+    <div class='section'>
+        <h2><i class='bi bi-shield-check'></i> מערכות בטיחות ופיצ'רים</h2>
+        <div class='grid'>$safety</div>
+    </div>
+
+    $price
+
+    <div class="footer">דוח זה נוצר אוטומטית. מידע זה אינו מהווה תחליף לבדיקה מקצועית.</div>
+</div>
+""")
+
+DOCUMENT = Template("""<!doctype html>
+<html lang="he">
+<head>
+    <meta charset="utf-8">
+    <title>$title</title>
+    <link rel="stylesheet" href="$icons">
+    $style
+</head>
+<body>
+$pages
+</body>
+</html>
+""")
+
+
+def esc(x):
+    return "" if x is None else escape(str(x))
+
+
+# (label, html value) rows of a report, in display order
+def display_pairs(result):
+    record = result["record"]
+    pairs = [("מס' שלדה/מנוע", esc(record.get("misgeret", "") or record.get("shilda", "")))]
+    for key in GENERAL_FIELDS:
+        if record.get(key):
+            pairs.append((LABEL_MAP.get(key, key), esc(record.get(key))))
+
+    if result.get("disability_status"):
+        pairs.append(("תג נכה", YES))
+        pairs.append(("סוג תג", esc(result.get("disability_type"))))
+        pairs.append(("תאריך הפקה", esc(result.get("disability_issue_date"))))
+    else:
+        pairs.append(("תג נכה", NO))
+    pairs.append(("ייבוא אישי", YES if result.get("personal_import") else NO))
+
+    for key in OTHER_FIELDS:
+        if record.get(key):
+            pairs.append((LABEL_MAP.get(key, key), esc(record.get(key))))
+
+    # One pass for both: *_ind fields as yes/no icons, then unlabelled *_nm fields
+    indicators, names = [], []
+    for k, v in record.items():
+        if k.endswith("_ind"):
+            indicators.append((LABEL_MAP.get(k, k.replace("_ind", "").strip()), YES if str(v) == "1" else NO))
+        elif k.endswith("_nm") and v and LABEL_MAP.get(k) is None:
+            names.append((esc(k.replace("_nm", "")), esc(v)))
+    return pairs + indicators + names
+
+
+def price_html(result):
+    min_price, max_price = result.get("min_price") or 0, result.get("max_price") or 0
+    if min_price == max_price == 0:
+        return PRICE_ONLY.substitute(price_text=esc("מחיר יבואן: לא זמין"))
+    low, high = float(min_price), float(max_price)
+    if low != high:
+        price_text = f"מחיר יבואן משוער: ₪{int(low):,} – ₪{int(high):,}"
+    else:
+        price_text = f"מחיר יבואן משוער: ₪{int(low):,}"
+    if high <= 0:
+        return PRICE_ONLY.substitute(price_text=esc(price_text))
+    return PRICE_BAR.substitute(price_text=esc(price_text), importer=esc(result["record"].get("yevuan_rehev", "")),
+                                pct=int(low / high * 100), low=f"{int(low):,}", high=f"{int(high):,}")
+
+
+# One report page (the <div class="page"> block) for a lookup() result
+def render_page(result, generated=None):
+    generated = generated or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [ROW.substitute(label=label, value=value) for label, value in display_pairs(result)]
+    return PAGE.substitute(generated=generated, general="".join(rows[:10]), licensing="".join(rows[10:15]),
+                           technical="".join(rows[15:22]), safety="".join(rows[22:]), price=price_html(result))
+
+
+def render_document(pages, title, css_href=None):
+    style = f'<link rel="stylesheet" href="{css_href}">' if css_href else f"<style>\n{REPORT_CSS}</style>"
+    return DOCUMENT.substitute(title=esc(title), icons=ICONS_CSS, style=style, pages="".join(pages))
+
+
+def report_title(result):
+    return f"דו\"ח רכב - {result['record'].get('mispar_rechev', '')}"
+
+
+# Self-contained single-vehicle report, as the GUI exports it
+def render_report(result, generated=None):
+    return render_document([render_page(result, generated)], report_title(result))
+
+
+def report_name(result):
+    plate = re.sub(r"[^\w-]", "_", str(result["record"].get("mispar_rechev", "") or "report"))
+    return f"{plate}.html"
+
+
+# Lookup results from a bulk output line, a bare lookup() result or a VehicleRecord; failed lines are skipped
+def as_result(item):
+    if hasattr(item, "to_result"):
+        return item.to_result()
+    if "record" in item:
+        return item
+    if item.get("ok") and item.get("result") is not None:
+        return as_result(item["result"])
+    return None
+
+
+def read_results(path):
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                result = as_result(json.loads(line))
+                if result is not None:
+                    yield result
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# Process pool work: one chunk of (result, file name) pairs written as files, or of results returned as pages
+def _write_chunk(named, out_dir, generated):
+    for result, name in named:
+        doc = render_document([render_page(result, generated)], report_title(result), "report.css")
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(doc)
+    return len(named)
+
+
+def _render_chunk(results, generated):
+    return [render_page(result, generated) for result in results]
+
+
+def _chunks(results, size):
+    results = iter(results)
+    while True:
+        chunk = list(islice(results, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ReportBatch:
+    """Renders many vehicle reports across a process pool.
+
+    ``write_dir()`` writes one HTML file per vehicle plus a shared
+    report.css; ``write_file()`` writes a single printable document with one
+    page per vehicle, in input order. Results are read lazily and only a
+    few chunks are in flight at a time. ``reports`` and ``seconds`` give
+    the throughput of the last run.
+
+    File names are assigned before the chunks are handed out: a plate seen
+    again, or a result without one, gets ``_2``, ``_3``... appended rather
+    than overwriting an earlier report. ``renamed`` counts them.
+    """
+
+    def __init__(self, workers=None, chunk_size=50):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.generated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.reports = 0
+        self.renamed = 0
+        self.seconds = 0.0
+
+    # Usable lookup results among the input items
+    def _results(self, items):
+        return (r for r in map(as_result, items) if r is not None)
+
+    # (result, file name) pairs with every name unique
+    def _named(self, results):
+        used = set()
+        for result in results:
+            base = name = report_name(result)[:-len(".html")]
+            n = 1
+            while name in used:
+                n += 1
+                name = f"{base}_{n}"
+            if n > 1:
+                self.renamed += 1
+            used.add(name)
+            yield result, f"{name}.html"
+
+    # Run fn over the chunks, yielding each chunk's return value in order
+    def _map(self, fn, items, *args):
+        chunks = _chunks(items, self.chunk_size)
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield fn(chunk, *args)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(fn, chunk, *args))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def write_dir(self, results, out_dir):
+        started = time.perf_counter()
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "report.css"), "w", encoding="utf-8") as f:
+            f.write(REPORT_CSS)
+        self.renamed = 0
+        self.reports = sum(self._map(_write_chunk, self._named(self._results(results)), out_dir, self.generated))
+        self.seconds = time.perf_counter() - started
+        return self.reports
+
+    def write_file(self, results, path, title="דו\"ח צי רכבים"):
+        started = time.perf_counter()
+        head, tail = render_document(["\0"], title).split("\0")
+        self.reports = 0
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(head)
+            for pages in self._map(_render_chunk, self._results(results), self.generated):
+                f.write("".join(pages))
+                self.reports += len(pages)
+            f.write(tail)
+        self.seconds = time.perf_counter() - started
+        return self.reports
+
+    def rate(self):
+        return self.reports / self.seconds if self.seconds else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plate_lookup.report", description="Render HTML vehicle reports from bulk lookup results.")
+    parser.add_argument("input", help="bulk lookup output (JSONL, as written by python -m plate_lookup); '-' for stdin")
+    out = parser.add_mutually_exclusive_group(required=True)
+    out.add_argument("-o", "--output-dir", help="write one report per vehicle (and a shared report.css) here")
+    out.add_argument("--single-file", help="write every report as a page of one printable HTML file")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="reports per process task (default: 50)")
+    args = parser.parse_args(argv)
+
+    batch = ReportBatch(args.workers, args.chunk_size)
+    results = read_results(args.input)
+    if args.output_dir:
+        batch.write_dir(results, args.output_dir)
+        target = args.output_dir
+    else:
+        batch.write_file(results, args.single_file)
+        target = args.single_file
+    print(f"{batch.reports} reports to {target} in {batch.seconds:.1f}s ({batch.rate():.0f} reports/s)", file=sys.stderr)
+    if batch.renamed:
+        print(f"{batch.renamed} reports with a repeated or missing plate were saved with a _2, _3... suffix", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# CKAN API endpoint and resource IDs on data.gov.il
+BASE_URL = "https://data.gov.il/api/3/action/datastore_search"
+
+VEHICLE_RES = "053cea08-09bc-40ec-8f7a-156f0677aff3"
+PERSONAL_RES = "03adc637-b6fe-402b-9937-7c3d3afc9140"
+PRICE_RES = "39f455bf-6db0-4926-859d-017f34eacbcb"
+DETAILS_RES = "142afde2-6228-49f9-8a29-9b6c3a0cbe40"
+DISABILITY_RES = "c8b9f9c8-4612-4068-934f-d4acd2e3c06e"
+COUNT_RES = "5e87a7a1-2f6f-41c1-8aec-7216d52a6cf6"
+
+# Cache lifetime for every query (7 days)
+CACHE_TTL = 7 * 24 * 3600
+
+# Default value for fields the details dataset doesn't fill in ("not registered")
+NOT_REGISTERED = "לא רשום"
+
+# Fields copied from the model details dataset into the vehicle record
+DETAIL_FIELDS = [
+    "automatic_ind",
+    "merkav",
+    "nefah_manoa",
+    "kvuzat_agra_cd",
+    "abs_ind",
+    "kariot_avir_source",
+    "hege_koah_ind",
+    "halonot_hashmal_source",
+    "halon_bagg_ind",
+    "mispar_dlatot",
+    "koah_sus",
+    "mispar_moshavim",
+    "bakarat_yatzivut_ind",
+    "kosher_grira_im_blamim",
+    "kosher_grira_bli_blamim",
+    "kvutzat_zihum",
+    "bakarat_stiya_menativ_ind",
+    "nitur_merhak_milfanim_ind",
+    "zihuy_beshetah_nistar_ind",
+]
+
+# A cleaner label mapping for better display
+LABEL_MAP = {
+    "mispar_rechev": "מספר רכב",
+    "tozeret_nm": "יצרן",
+    "degem_nm": "דגם",
+    "degem_manoa": "דגם מנוע",
+    "shnat_yitzur": "שנת יצור",
+    "tzeva_rechev": "צבע",
+    "sug_delek_nm": "סוג דלק",
+    "merkav": "מבנה רכב",
+    "nefach_manoa": "נפח מנוע",
+    "koah_sus": "כוח סוס",
+    "mispar_dlatot": "מספר דלתות",
+    "mispar_moshavim": "מספר מושבים",
+    "baalut": "בעלות",
+    "tokef_dt": "תוקף רישום",
+    "mivchan_acharon_dt": "מבחן אחרון",
+    "kvuzat_agra_cd": "קבוצת רישוי",
+    "automatic_ind": "תיבת הילוכים אוטומטית",
+    "abs_ind": "מערכת בלימה ABS",
+    "hege_koah_ind": "הגה כוח",
+    "kariot_avir_source": "כמות כריות אוויר",
+    "bakarat_stiya_menativ_ind": "בקרת סטייה מנתיב",
+    "bakarat_yatzivut_ind": "בקרת יציבות",
+    "halon_bagg_ind": "חלון בגג",
+    "nitur_merhak_milfanim_ind": "ניטור מרחק מלפנים",
+    "zihuy_beshetah_nistar_ind": "זיהוי בשטח נסתר",
+}
+
+# Resources by short name, as used by the local mirror
+RESOURCES = {
+    "vehicle": VEHICLE_RES,
+    "personal": PERSONAL_RES,
+    "price": PRICE_RES,
+    "details": DETAILS_RES,
+    "disability": DISABILITY_RES,
+}
+
+# Column holding the license plate in each plate-keyed resource
+PLATE_COLUMNS = {
+    "vehicle": "mispar_rechev",
+    "personal": "mispar_rechev",
+    "disability": "MISPAR RECHEV",
+}
+
+# Resources keyed by model (degem_cd, tozeret_cd, shnat_yitzur)
+MODEL_RESOURCES = ("price", "details")
+
+# Columns actually used from each resource, requested with CKAN's "fields"
+# parameter and the only ones kept in the cache. None means every column.
+FIELDS = {
+    "vehicle": [
+        "mispar_rechev", "tozeret_cd", "tozeret_nm", "degem_cd", "degem_nm", "degem_manoa",
+        "shnat_yitzur", "tzeva_rechev", "sug_delek_nm", "baalut", "tokef_dt", "mivchan_acharon_dt",
+        "misgeret", "kvutzat_zihum",
+    ],
+    "personal": None,
+    "price": ["degem_cd", "tozeret_cd", "mehir", "shem_yevuan"],
+    "details": ["degem_cd", "tozeret_cd", "shnat_yitzur"] + DETAIL_FIELDS,
+    "disability": ["MISPAR RECHEV", "SUG TAV", "TAARICH HAFAKAT TAG"],
+}
@@ -0,0 +1,164 @@
+import heapq, itertools, threading, time
+
+# Priority classes, lowest value first
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    # Take a token and return 0, or return how long until one is available
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Scheduler:
+    """Central gate for upstream CKAN calls.
+
+    Every request first takes a slot: slots are handed out in priority
+    order (INTERACTIVE before BATCH before BACKGROUND, FIFO within a class),
+    at most ``rate`` per second (token bucket with ``burst``), and with at
+    most ``limit`` requests in flight. The limit adapts AIMD-style: it grows
+    by about one per window of fast successes and is halved on 429/5xx,
+    connection errors or responses slower than ``target_latency``.
+
+    Threads wait in acquire(); asyncio code awaits acquire_async(), which
+    takes its place in the same queue.
+    """
+
+    def __init__(self, rate=15.0, burst=30, initial_concurrency=8, min_concurrency=1, max_concurrency=64,
+                 target_latency=2.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.granted = {p: 0 for p in PRIORITY_NAMES}
+        self.backoffs = 0
+        self._waiters = []
+        self._async_waiters = {}
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    # Wait for a slot; with a CancelToken, gives up its place and raises Cancelled once it is cancelled
+    def acquire(self, priority=BATCH, token=None):
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            while True:
+                if token is not None and token.cancelled:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._notify()
+                    token.check()
+                if self._waiters[0] == entry and self.in_flight < int(self.limit):
+                    delay = self.bucket.take()
+                    if delay == 0:
+                        heapq.heappop(self._waiters)
+                        self.in_flight += 1
+                        self.granted[priority] = self.granted.get(priority, 0) + 1
+                        self._notify()
+                        return time.monotonic()
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait(0.1)
+
+    # acquire() for asyncio code: same queue, rate and limit, but waits without blocking the event loop.
+    # The task sleeps until release() (or whatever else frees its turn) wakes it, or until the token bucket refills.
+    async def acquire_async(self, priority=BATCH):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                delay = None
+                with self._cond:
+                    if self._waiters[0] == entry and self.in_flight < int(self.limit):
+                        delay = self.bucket.take()
+                        if delay == 0:
+                            heapq.heappop(self._waiters)
+                            self.in_flight += 1
+                            self.granted[priority] = self.granted.get(priority, 0) + 1
+                            self._notify()
+                            return time.monotonic()
+                    wakeup = loop.create_future()
+                    self._async_waiters[entry] = (loop, wakeup)
+                try:
+                    await asyncio.wait([wakeup], timeout=delay)
+                finally:
+                    with self._cond:
+                        self._async_waiters.pop(entry, None)
+        except BaseException:
+            # Task cancelled while queued: give up its place
+            with self._cond:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._notify()
+            raise
+
+    # Wake waiting threads, and the queue head if it is an asyncio task; call with the lock held
+    def _notify(self):
+        self._cond.notify_all()
+        if self._waiters and self._waiters[0] in self._async_waiters:
+            loop, wakeup = self._async_waiters[self._waiters[0]]
+            loop.call_soon_threadsafe(_wake, wakeup)
+
+    # Give back the slot of a request that was abandoned, without counting it for or against the limit
+    def discard(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._notify()
+
+    # Give the slot back; ``status`` is the HTTP status, or None if the request failed outright
+    def release(self, started, status=None):
+        latency = time.monotonic() - started
+        with self._cond:
+            self.in_flight -= 1
+            if status is None or status == 429 or status >= 500 or latency > self.target_latency:
+                now = time.monotonic()
+                # One decrease per latency window, however many requests failed in it
+                if now - self._last_decrease > self.target_latency:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+                    self.backoffs += 1
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._notify()
+
+    def stats(self):
+        with self._cond:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": waiting,
+                "granted": {PRIORITY_NAMES.get(p, str(p)): n for p, n in self.granted.items()},
+                "backoffs": self.backoffs,
+                "rate": self.bucket.rate,
+            }
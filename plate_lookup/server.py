@@ -0,0 +1,261 @@
+import argparse, json, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from . import metrics
+from .core import LookupEngine, NoDataFound
+from .http_client import CkanClient
+from .planner import InvalidPlate
+from .scheduler import BATCH, INTERACTIVE, Scheduler
+
+
+class Overloaded(Exception):
+    pass
+
+
+class LookupService:
+    """Shared worker pool in front of one LookupEngine (and so one cache).
+
+    Requests from every HTTP connection are queued onto ``workers`` lookup
+    threads; once ``max_queue`` lookups are waiting, new ones are refused.
+    Batch lookups run on their own pool (and through ``batch_engine`` if
+    given, normally one at batch priority) so they never queue ahead of
+    single lookups.
+    """
+
+    def __init__(self, engine, workers=16, max_queue=1000, batch_engine=None):
+        self.engine = engine
+        self.batch_engine = batch_engine or engine
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lookup-service")
+        self.batch_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lookup-batch")
+        self.started = time.time()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def _run(self, engine, plate):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return engine.lookup(plate)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def submit(self, plate, batch=False):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                raise Overloaded(f"Lookup queue is full ({self.queued} waiting)")
+            self.queued += 1
+        if batch:
+            return self.batch_pool.submit(self._run, self.batch_engine, plate)
+        return self.pool.submit(self._run, self.engine, plate)
+
+    def lookup(self, plate):
+        return self.submit(plate).result()
+
+    # Same result shape as bulk_lookup(), in input order
+    def lookup_batch(self, plates):
+        futures = []
+        for plate in plates:
+            try:
+                futures.append((plate, self.submit(plate, batch=True)))
+            except Overloaded as e:
+                futures.append((plate, e))
+        results = []
+        for plate, fut in futures:
+            try:
+                if isinstance(fut, Exception):
+                    raise fut
+                results.append({"plate": plate, "ok": True, "result": fut.result()})
+            except Exception as e:
+                results.append({"plate": plate, "ok": False, "error": str(e)})
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "uptime": round(time.time() - self.started, 1),
+            }
+        stats["model_catalog"] = {"models": len(self.engine.catalog), "hits": self.engine.catalog.hits,
+                                  "loads": self.engine.catalog.misses}
+        paths = self.engine.query_paths + self.batch_engine.query_paths if self.batch_engine is not self.engine \
+            else self.engine.query_paths
+        stats["query_paths"] = {f"{r}:{p}": n for (r, p), n in paths.items()}
+        scheduler = getattr(self.engine.client, "scheduler", None)
+        if scheduler is not None:
+            stats["upstream"] = scheduler.stats()
+            stats["upstream"]["hedged"] = self.engine.client.hedged
+            stats["upstream"]["hedge_wins"] = self.engine.client.hedge_wins
+        if self.engine.speculative:
+            stats["speculation"] = dict(self.engine.speculation)
+        return stats
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.batch_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server()
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/lookup":
+            plate = parse_qs(url.query).get("plate", [""])[0]
+            try:
+                self.send_json(200, self.service.lookup(plate))
+            except InvalidPlate as e:
+                self.send_json(400, {"error": str(e)})
+            except NoDataFound as e:
+                self.send_json(404, {"error": str(e)})
+            except Overloaded as e:
+                self.send_json(503, {"error": str(e)})
+            except Exception as e:
+                self.send_json(502, {"error": str(e)})
+        elif url.path == "/stats":
+            self.send_json(200, self.service.stats())
+        elif url.path == "/metrics":
+            if parse_qs(url.query).get("format", [""])[0] == "json":
+                self.send_json(200, self.service.engine.metrics.to_dict())
+            else:
+                body = self.service.engine.metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        elif url.path == "/health":
+            self.send_json(200, {"ok": True})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    # POST /batch with {"plates": [...]} or a bare JSON list of plates
+    def do_POST(self):
+        if urlparse(self.path).path != "/batch":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"[]")
+            plates = payload.get("plates", []) if isinstance(payload, dict) else payload
+            if not isinstance(plates, list):
+                raise ValueError("plates must be a list")
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        self.send_json(200, {"results": self.service.lookup_batch(plates)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    handler = type("BoundLookupHandler", (LookupHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class RemoteLookup:
+    """Client for a running lookup service, usable wherever a LookupEngine is.
+
+    Lets desktops and scripts share the server's warm cache instead of
+    keeping their own.
+    """
+
+    def __init__(self, url, timeout=60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        import requests
+        self.session = requests.Session()
+
+    # The trace only sees the round trip; the server keeps the per-stage detail.
+    # A cancelled token drops the response, but the server finishes the lookup (and caches it).
+    def lookup(self, plate, trace=None, token=None):
+        trace = trace if trace is not None else metrics.Trace(plate)
+        if token is not None:
+            token.check()
+        with trace.stage("remote"):
+            response = self.session.get(f"{self.url}/lookup", params={"plate": str(plate)}, timeout=self.timeout)
+        trace.add("remote", requests=1, bytes=len(response.content))
+        trace.finish()
+        if token is not None:
+            token.check()
+        payload = response.json()
+        if response.status_code == 404:
+            raise NoDataFound(payload.get("error", ""))
+        if response.status_code == 400:
+            raise InvalidPlate(payload.get("error", ""))
+        if response.status_code != 200:
+            raise RuntimeError(payload.get("error", f"HTTP {response.status_code}"))
+        return payload
+
+    def close(self):
+        self.session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plate_lookup.server", description="Local HTTP/JSON plate lookup service.")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port (default: 8765)")
+    parser.add_argument("-w", "--workers", type=int, default=16, help="lookup worker threads (default: 16)")
+    parser.add_argument("--max-queue", type=int, default=1000, help="waiting lookups before refusing with 503")
+    parser.add_argument("--cache-dir", default="cache", help="cache directory (default: cache)")
+    parser.add_argument("--rate", type=float, default=15.0, help="upstream requests per second (default: 15)")
+    parser.add_argument("--latency-mode", action="store_true",
+                        help="speculative personal-import queries for single lookups, hedged duplicates of slow requests")
+    parser.add_argument("--hedge-percentile", type=float, default=95.0,
+                        help="with --latency-mode, duplicate requests slower than this percentile (default: 95)")
+    args = parser.parse_args(argv)
+
+    client = CkanClient(pool_size=args.workers * 6, scheduler=Scheduler(rate=args.rate),
+                        hedge_percentile=args.hedge_percentile if args.latency_mode else None)
+    engine = LookupEngine(args.cache_dir, fanout=True, stage_workers=args.workers * 3, client=client,
+                          priority=INTERACTIVE, speculative=args.latency_mode)
+    # Same cache and model catalog, but its upstream calls queue behind single lookups
+    batch_engine = LookupEngine(fanout=True, stage_workers=args.workers * 3, client=client, cache=engine.cache,
+                                catalog=engine.catalog, priority=BATCH)
+    service = LookupService(engine, workers=args.workers, max_queue=args.max_queue, batch_engine=batch_engine)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving plate lookups on http://{args.host}:{args.port} "
+          "(GET /lookup?plate=..., POST /batch, GET /stats, GET /metrics)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        batch_engine.close()
+        engine.close()
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
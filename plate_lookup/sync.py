@@ -0,0 +1,154 @@
+import argparse, os, sys, time
+
+from . import resources
+from .http_client import get_client
+from .scheduler import BACKGROUND
+from .mirror import MirrorStore, norm_row
+
+
+# Last-modified metadata of a resource, or None when CKAN doesn't report it
+def resource_last_modified(client, resource):
+    try:
+        info = client.action("resource_show", {"id": resources.RESOURCES[resource]}).get("result") or {}
+    except Exception:
+        return None
+    return info.get("last_modified") or info.get("metadata_modified")
+
+
+def sync_resource(store, resource, client, batch_size=5000, full=False, revalidate=False, progress=None):
+    """Bring one mirrored resource up to date with data.gov.il.
+
+    If the resource's last-modified metadata is unchanged since the last
+    sync nothing is fetched. Otherwise only the rows past the local
+    high-water mark (``_id``) are downloaded: paging starts at the last row
+    held, which must still be the high-water row, and everything after it
+    is appended. Each batch is applied in one transaction together with the
+    new high-water mark, so an interrupted sync resumes where it stopped.
+    If rows were removed or renumbered upstream, the resource is reloaded
+    in full.
+
+    CKAN gives no way to list rows changed in place, so a normal sync
+    doesn't see them. ``revalidate=True`` additionally pages through every
+    held row, compares it with the local copy and rewrites the edited ones;
+    the pass saves its position after each page and resumes from there.
+    """
+    started = time.time()
+    last_modified = resource_last_modified(client, resource)
+    state = None if full else store.sync_state(resource)
+
+    def report(mode, rows, changed=0):
+        elapsed = time.time() - started
+        return {"resource": resource, "mode": mode, "rows": rows, "changed": changed, "seconds": round(elapsed, 3),
+                "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0}
+
+    def reload():
+        return dict(sync_resource(store, resource, client, batch_size, True, False, progress), mode="reload")
+
+    if state is None:
+        count = store.load_ckan(resource, client, page_size=batch_size, progress=progress)
+        store.set_sync_state(resource, store.sync_state(resource)[:2] + (last_modified,))
+        return report("full", count)
+
+    high_water, row_count, synced_modified = state
+    if last_modified and last_modified == synced_modified and not revalidate:
+        return report("unchanged", 0)
+
+    # Start one row early: the last row held anchors the tail, and anything
+    # else there means rows before it were removed or renumbered
+    offset = max(row_count - 1, 0)
+    anchored = row_count == 0
+    new_rows = 0
+    while True:
+        params = {"resource_id": resources.RESOURCES[resource], "limit": batch_size,
+                  "offset": offset, "sort": "_id asc"}
+        records = client.search(params).get("result", {}).get("records", [])
+        fetched = len(records)
+        offset += fetched
+        if not anchored:
+            if not records or int(records[0].get("_id") or 0) != high_water:
+                return reload()
+            records = records[1:]
+            anchored = True
+        if records:
+            high_water = max(int(r.get("_id") or 0) for r in records)
+            row_count += len(records)
+            store.put_many(resource, records, row_count - len(records), state=(high_water, row_count, synced_modified))
+            new_rows += len(records)
+        if progress:
+            progress(resource, offset)
+        if fetched < batch_size:
+            break
+
+    changed = 0
+    if revalidate:
+        changed = revalidate_rows(store, resource, client, row_count, batch_size, progress)
+        if changed is None:
+            return reload()
+
+    # Only now is the resource known to match last_modified
+    store.set_sync_state(resource, (high_water, row_count, last_modified))
+    store.mark_loaded(resource, "ckan")
+    return report("revalidate" if revalidate else "delta", new_rows, changed)
+
+
+# Compare the first ``row_count`` upstream rows with the local copy and
+# rewrite the edited ones. Returns how many changed, or None if the rows no
+# longer line up and the resource needs a reload.
+def revalidate_rows(store, resource, client, row_count, batch_size=5000, progress=None):
+    offset = store.revalidate_offset(resource)
+    changed = 0
+    while offset < row_count:
+        params = {"resource_id": resources.RESOURCES[resource], "limit": min(batch_size, row_count - offset),
+                  "offset": offset, "sort": "_id asc"}
+        records = client.search(params).get("result", {}).get("records", [])
+        if not records:
+            return None
+        ids = [int(r.get("_id") or 0) for r in records]
+        local = store.get_rows(resource, ids[0], ids[-1])
+        if [int(r.get("_id") or 0) for r in local] != ids:
+            return None
+        edited = [rec for rec, old in zip(records, local) if norm_row(rec) != norm_row(old)]
+        if edited:
+            store.put_many(resource, edited)
+            changed += len(edited)
+        offset += len(records)
+        store.set_revalidate_offset(resource, offset)
+        if progress:
+            progress(resource, offset)
+    store.set_revalidate_offset(resource, None)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="plate_lookup.sync", description="Incremental refresh of the local dataset mirror.")
+    parser.add_argument("resources", nargs="*", default=list(resources.RESOURCES), help="resource names (default: all)")
+    parser.add_argument("--db", default=os.path.join("cache", "mirror.db"), help="mirror database (default: cache/mirror.db)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per request and per transaction")
+    parser.add_argument("--full", action="store_true", help="reload from scratch instead of syncing the delta")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="also compare every held row with data.gov.il and rewrite rows edited in place (downloads the whole resource)")
+    args = parser.parse_args(argv)
+
+    unknown = [r for r in args.resources if r not in resources.RESOURCES]
+    if unknown:
+        parser.error(f"unknown resource(s): {', '.join(unknown)}")
+
+    store = MirrorStore(args.db)
+    client = get_client().with_priority(BACKGROUND)
+    started = {}
+
+    def progress(name, rows):
+        elapsed = time.time() - started[name]
+        print(f"\r{name}: {rows} rows ({rows / elapsed if elapsed else 0:.0f} rows/s)", end="", file=sys.stderr, flush=True)
+
+    for name in args.resources:
+        started[name] = time.time()
+        res = sync_resource(store, name, client, batch_size=args.batch_size, full=args.full,
+                              revalidate=args.revalidate, progress=progress)
+        print(f"\r{name}: {res['mode']}, {res['rows']} new rows, {res['changed']} changed in {res['seconds']}s "
+              f"({res['rows_per_sec']} rows/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())